@@ -2,19 +2,19 @@ import re
 import json
 import pytesseract
 from PIL import Image
-import pdf2image
 from groq import Groq
 from typing import Dict, Any, Optional
 import io
 import os
 from dotenv import load_dotenv
+from pdf_text import iter_pdf_page_texts
 
 load_dotenv()
 
 class InvoiceExtractor:
     def __init__(self, groq_api_key: str):
         """Initialize the InvoiceExtractor with Groq API client"""
-        self.client = Groq(api_key=groq_api_key)
+        self.client = Groq(api_key=groq_api_key, max_retries=5)
         self.extraction_prompt = """
         Extract the following information from the invoice text below. Return ONLY a valid JSON object with these fields:
         - invoice_number: The invoice number/identifier
@@ -49,15 +49,11 @@ class InvoiceExtractor:
             raise Exception(f"Error extracting text from image: {str(e)}")
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF using pdf2image and Tesseract"""
+        """Extract text from PDF, using the embedded text layer and OCR only for scanned pages"""
         try:
-            # Convert PDF to images
-            images = pdf2image.convert_from_path(pdf_path)
             full_text = ""
-            
-            for i, image in enumerate(images):
-                text = pytesseract.image_to_string(image)
-                full_text += f"Page {i+1}:\n{text}\n\n"
+            for page_number, text in iter_pdf_page_texts(pdf_path=pdf_path):
+                full_text += f"Page {page_number}:\n{text}\n\n"
             
             return full_text
         except Exception as e:
@@ -66,12 +62,9 @@ class InvoiceExtractor:
     def extract_text_from_pdf_bytes(self, pdf_bytes: bytes) -> str:
         """Extract text from PDF bytes"""
         try:
-            images = pdf2image.convert_from_bytes(pdf_bytes)
             full_text = ""
-            
-            for i, image in enumerate(images):
-                text = pytesseract.image_to_string(image)
-                full_text += f"Page {i+1}:\n{text}\n\n"
+            for page_number, text in iter_pdf_page_texts(pdf_bytes=pdf_bytes):
+                full_text += f"Page {page_number}:\n{text}\n\n"
             
             return full_text
         except Exception as e:
@@ -0,0 +1,41 @@
+import io
+from typing import Iterator, Optional, Tuple
+import PyPDF2
+import pdf2image
+import pytesseract
+
+# Page classifier copied from the RAG backend (LongProject/backend/app/services/pdf_pages.py):
+# trust the embedded text layer when it looks like real text, OCR only the pages
+# that are scanned or have a broken font encoding. The daily projects are standalone
+# scripts that can't import the backend package, so this is a deliberate copy; keep
+# it (and the 32-character threshold) in sync with the backend's.
+
+def text_layer_is_usable(text: str, min_chars: int = 32) -> bool:
+    """Decide whether a page's embedded text layer is good enough to skip OCR"""
+    stripped = (text or "").strip()
+    if len(stripped) < min_chars:
+        return False
+    printable = sum(1 for ch in stripped if ch.isprintable() or ch.isspace())
+    if printable / len(stripped) < 0.95:
+        return False
+    if (stripped.count("\ufffd") + 5 * stripped.count("(cid:")) / len(stripped) > 0.02:
+        return False
+    words = stripped.split()
+    wordlike = sum(1 for word in words if any(ch.isalpha() for ch in word))
+    return wordlike / len(words) >= 0.5
+
+def iter_pdf_page_texts(pdf_path: Optional[str] = None, pdf_bytes: Optional[bytes] = None,
+                        dpi: int = 300) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) per page, rasterizing and OCR-ing a page only when needed"""
+    source = open(pdf_path, 'rb') if pdf_path else io.BytesIO(pdf_bytes)
+    with source:
+        reader = PyPDF2.PdfReader(source)
+        for index, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            if not text_layer_is_usable(text):
+                if pdf_path:
+                    images = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=index, last_page=index)
+                else:
+                    images = pdf2image.convert_from_bytes(pdf_bytes, dpi=dpi, first_page=index, last_page=index)
+                text = "\n".join(pytesseract.image_to_string(image) for image in images)
+            yield index, text
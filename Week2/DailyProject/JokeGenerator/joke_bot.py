@@ -12,7 +12,7 @@ class JokeGenerator:
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
         
-        self.client = Groq(api_key=self.api_key)
+        self.client = Groq(api_key=self.api_key, max_retries=5)
         
         # Predefined safe categories
         self.safe_categories = [
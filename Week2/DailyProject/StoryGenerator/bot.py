@@ -11,7 +11,7 @@ class StoryGenerator:
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
         
-        self.client = Groq(api_key=self.api_key)
+        self.client = Groq(api_key=self.api_key, max_retries=5)
         
         # Genre options
         self.genres = [
@@ -14,7 +14,7 @@ class GroqChatBot:
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
         
-        self.client = Groq(api_key=self.api_key)
+        self.client = Groq(api_key=self.api_key, max_retries=5)
         self.conversation_history: List[Dict] = []
         self.search_enabled = False
         self.max_history_length = 12  # 6 exchanges
@@ -0,0 +1,46 @@
+"""
+Command line entry point: python -m app [serve|sync|ingest] ...
+
+The CLI lives here rather than in main3.py because OCR worker processes are
+spawned, and a spawned process re-imports the parent's __main__ module
+(as __mp_main__) unless it is a package's __main__, like this one. Run as
+`python -m app.main3`, every OCR worker would load the whole API with it.
+"""
+import argparse
+import asyncio
+import json
+from .main3 import app, bulk_ingestion_service, document_processor, folder_sync_service
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app", description="Multi-Modal RAG Chatbot backend")
+    subcommands = parser.add_subparsers(dest="command")
+    
+    serve_parser = subcommands.add_parser("serve", help="Run the API server (default)")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    
+    sync_parser = subcommands.add_parser("sync", help="Incrementally re-ingest a folder")
+    sync_parser.add_argument("folder")
+    
+    ingest_parser = subcommands.add_parser("ingest", help="Bulk-ingest files, directories or globs in place")
+    ingest_parser.add_argument("paths", nargs="+")
+    ingest_parser.add_argument("--pattern", default="**/*")
+    ingest_parser.add_argument("--workers", type=int, default=None)
+    
+    args = parser.parse_args()
+    
+    try:
+        if args.command == "sync":
+            print(json.dumps(asyncio.run(folder_sync_service.sync(args.folder)), indent=2))
+        elif args.command == "ingest":
+            file_paths = bulk_ingestion_service.resolve_paths(args.paths, pattern=args.pattern)
+            summary = asyncio.run(bulk_ingestion_service.ingest(file_paths, workers=args.workers))
+            print(json.dumps(summary, indent=2))
+        else:
+            import uvicorn
+            uvicorn.run(app, host=getattr(args, "host", "0.0.0.0"), port=getattr(args, "port", 8000))
+    finally:
+        document_processor.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -22,12 +22,120 @@ class Settings(BaseSettings):
         "llama3-70b": "llama-3.3-70b-versatile"
     }
     
+    # Groq client
+    GROQ_BASE_URL: str = os.getenv("GROQ_BASE_URL", "")  # override to point at a local stub
+    GROQ_TIMEOUT: float = 60.0  # seconds for a whole completion call
+    GROQ_CONNECT_TIMEOUT: float = 5.0
+    GROQ_MAX_RETRIES: int = 4  # scheduler retries on 429/5xx/connection errors
+    GROQ_MAX_CONNECTIONS: int = 32  # pooled keep-alive HTTP connections
+    GROQ_MAX_IN_FLIGHT: int = 16  # concurrent completion calls per worker
+    LLM_BACKOFF_BASE: float = 0.5  # seconds; full-jitter exponential backoff between retries
+    LLM_BACKOFF_MAX: float = 20.0
+    
+    # Hedged requests: if a model has not produced its first token within its recent
+    # p95 time-to-first-token (clamped to [MIN, MAX]), also ask its fallback model
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_FALLBACK_MODELS: Dict[str, str] = {
+        "llama2-70b": "llama3-70b",
+        "gemma-7b": "llama3-70b",
+        "llama3-70b": "gpt-oss-120b",
+        "gpt-oss-120b": "llama3-70b"
+    }
+    LLM_HEDGE_DEFAULT_DELAY: float = 2.0  # seconds, until a model has LLM_HEDGE_MIN_SAMPLES
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY: float = 0.3
+    LLM_HEDGE_MAX_DELAY: float = 5.0
+    
+    # LLM completion cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    LLM_CACHE_MEMORY_ENTRIES: int = 1024
+    LLM_CACHE_MAX_DISK_BYTES: int = 256 * 1024 * 1024
+    
+    # Prompt budgets: tokens available for context + history + question per LLM choice
+    # (model context window minus the 1024-token completion and chat-message overhead)
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+        "llama2-70b": 2500,
+        "gpt-oss-120b": 6000,
+        "gemma-7b": 4000,
+        "llama3-70b": 6000
+    }
+    # HF tokenizers used to count prompt tokens; gated repos need HF_TOKEN, otherwise
+    # counting falls back to a conservative regex estimate
+    LLM_TOKENIZERS: Dict[str, str] = {
+        "llama2-70b": "hf-internal-testing/llama-tokenizer",
+        "gpt-oss-120b": "openai/gpt-oss-120b",
+        "gemma-7b": "google/gemma-7b-it",
+        "llama3-70b": "meta-llama/Llama-3.3-70B-Instruct"
+    }
+    
+    # Request deadlines: every chat request gets an end-to-end time budget. Optional
+    # stages (web/arXiv search, hybrid retrieval) are skipped or cut so that at least
+    # DEADLINE_GENERATION_RESERVE seconds remain for the LLM call.
+    REQUEST_DEADLINE_SECONDS: float = 30.0
+    DEADLINE_GENERATION_RESERVE: float = 8.0
+    DEADLINE_MIN_STAGE_SECONDS: float = 0.5
+    COALESCE_DEADLINE_SLACK_SECONDS: float = 2.0  # how much earlier a shared computation's deadline may end
+    RETRIEVAL_TIMEOUT: float = 10.0  # cap per vector/BM25 retrieval call
+    INTERNET_SEARCH_TIMEOUT: float = 6.0  # cap per web/arXiv search
+    
+    # Conversation history: recent messages verbatim, older ones folded into a running
+    # summary; the rendered history never exceeds HISTORY_TOKEN_BUDGET tokens
+    HISTORY_TOKEN_BUDGET: int = 1000
+    HISTORY_SUMMARY_TOKENS: int = 300
+    HISTORY_RECENT_MESSAGES: int = 6
+    HISTORY_FOLD_BLOCK: int = 4  # messages summarized per incremental update
+    HISTORY_SUMMARY_MODEL: str = "llama3-70b"
+    HISTORY_SUMMARY_CACHE_SIZE: int = 1024
+    HISTORY_FOLD_RETRY_SECONDS: float = 30.0  # first retry after a failed summary; doubles per failure
+    HISTORY_FOLD_RETRY_MAX_SECONDS: float = 600.0
+    
+    # Near-duplicate suppression of retrieved chunks (64-bit SimHash, stamped at ingestion)
+    NEAR_DUPLICATE_FILTER: bool = True
+    NEAR_DUPLICATE_MAX_BITS: int = 4  # one changed word in a ~200-word chunk flips ~3 bits
+    
     # Vector Database
     PINECONE_INDEX_NAME: str = "multimodal-rag"
     
-    # RAG Config
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 80
+    # RAG Config (sizes in EMBEDDING_MODEL tokens; all-MiniLM-L6-v2 truncates input past 256)
+    CHUNK_SIZE: int = 256  # includes [CLS]/[SEP], so chunks carry at most 254 text tokens
+    CHUNK_OVERLAP: int = 24
+    
+    # Ingestion
+    MAX_UPLOAD_BYTES: int = 100 * 1024 * 1024  # reject uploads larger than 100 MB
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024  # spool uploads to disk 1 MB at a time
+    INGEST_BATCH_SIZE: int = 64  # chunks embedded / upserted per batch
+    INGEST_QUEUE_SIZE: int = 4  # max batches buffered between pipeline stages
+    INGEST_WORKERS: int = 2  # ingestion jobs processed concurrently
+    BULK_INGEST_WORKERS: int = 4  # files ingested concurrently by /bulk-upload
+    EMBED_BATCH_SIZE: int = 128  # chunks per embedding call across all concurrent files
+    EMBED_LINGER_MS: int = 20  # max wait for an embedding batch to fill
+    INGEST_THREADS: int = 2  # threads for blocking parse/embed/upsert work
+    QUERY_THREADS: int = 8  # threads for blocking retrieval on the chat path
+    SEARCH_THREADS: int = 8  # threads for blocking web/arXiv search clients
+    INGEST_JOB_HISTORY: int = 500  # finished jobs kept for GET /jobs/{id}
+    INGEST_MAX_RSS_MB: int = 2048  # parsing pauses while RSS is above this (0 disables)
+    PDF_READER_WINDOW: int = 200  # reopen the PDF reader every N pages to drop its object cache
+    PDF_MIN_TEXT_CHARS: int = 32  # pages with a shorter/garbled text layer are OCR'd instead
+    
+    SYNC_MANIFEST_PATH: str = "sync_manifest.json"  # per-file hashes for folder sync
+    SYNC_CHECKPOINT_FILES: int = 20  # save the sync manifest after this many changed files...
+    SYNC_CHECKPOINT_SECONDS: float = 30.0  # ...or this long since the last save, whichever comes first
+    
+    # Knowledge graph (built at ingestion time, read at query time)
+    KG_PATH: str = "knowledge_graph.json"  # snapshot; changes since are appended to KG_PATH.log
+    KG_COMPACT_MIN_BYTES: int = 8 * 1024 * 1024  # rewrite the snapshot once the log is this big (and bigger than it)
+    KG_MAX_ENTITIES_PER_CHUNK: int = 20  # most frequent entities kept per chunk
+    KG_QUERY_ENTITIES: int = 10  # entities put in a knowledge_graph prompt
+    KG_RELATIONS_PER_ENTITY: int = 3  # strongest co-occurrence links listed per entity
+    
+    # OCR
+    OCR_WORKERS: int = 2  # tesseract worker processes
+    OCR_MAX_SIDE: int = 2000  # downscale images whose longest side exceeds this (0 disables)
+    OCR_BINARIZE: bool = False  # grayscale + threshold before OCR
+    OCR_CACHE_SIZE: int = 256  # OCR results cached by image hash
+    OCR_PDF_DPI: int = 300  # rasterization DPI for scanned PDF pages
     
     class Config:
         env_file = ".env"
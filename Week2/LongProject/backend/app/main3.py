@@ -1,17 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import List, Any, Dict, Optional
+import asyncio
 import uuid
 import os
 import time
+import json
 from pathlib import Path
 
 # Import your existing modules
 from .models.models import *
 from .services.rag_service import rag_service
 from .services.document_processor import document_processor
-from .services.vector_store import vector_store_service
-from .utils.observability import setup_observability
+from .services.ingestion_jobs import ingestion_job_queue
+from .services.folder_sync import folder_sync_service
+from .services.bulk_ingestion import bulk_ingestion_service
+from .services.llm_service import llm_service
+from .services.llm_cache import completion_cache
+from .services.llm_scheduler import llm_scheduler
+from .services.latency_tracker import latency_tracker
+from .services.knowledge_graph import knowledge_graph_service
+from .config import settings
+from .utils.observability import setup_observability, log_rag_operation
+from .utils.deadline import start_deadline, current_deadline, DeadlineExceeded
+from .utils.timings import start_timings
+from .utils.executors import ingest_executor
 
 app = FastAPI(title="Multi-Modal RAG Chatbot", version="1.0.0")
 
@@ -27,6 +41,16 @@ app.add_middleware(
 # Setup observability
 tracer = setup_observability()
 
+@app.on_event("startup")
+async def start_ingestion_workers():
+    ingestion_job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_ingestion_workers():
+    await ingestion_job_queue.stop()
+    await llm_service.aclose()
+    document_processor.shutdown()
+
 # Global store for uploaded documents
 UPLOADED_DOCUMENTS = set()
 DOCUMENT_METADATA = {}
@@ -49,65 +73,151 @@ def normalize_conversation_history(history: List[Any]) -> List[Dict[str, Any]]:
             })
     return normalized
 
+async def until_disconnect(http_request: Request, awaitable):
+    """Await `awaitable`, cancelling it (and everything under it) if the client goes away first"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.5)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                print("⚠️ Client disconnected, cancelling request")
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def deadline_detail(error: DeadlineExceeded) -> Dict[str, Any]:
+    deadline = current_deadline()
+    return {"error": str(error), "dropped_stages": deadline.dropped if deadline else []}
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     print(f"🔍 Received chat request - Message: {request.message}, LLM: {request.llm_choice}, RAG: {request.rag_variant}")
     
     start_time = time.time()
+    # every stage below (retrieval, web search, generation) runs against this budget
+    start_deadline(request.deadline_seconds)
+    timings = start_timings()
     
     try:
         formatted_history = normalize_conversation_history(request.conversation_history)
         
         print(f"📝 Formatted history: {len(formatted_history)} messages")
         
-        # Use all uploaded documents as context (no need to specify file path)
-        if request.rag_variant == RAGVariant.VANILLA:
-            response, sources = await rag_service.vanilla_rag(
-                request.message, 
-                formatted_history,
-                request.llm_choice.value,
-                request.use_internet_search
-            )
-        elif request.rag_variant == RAGVariant.KNOWLEDGE_GRAPH:
-            response, sources = await rag_service.knowledge_graph_rag(
-                request.message,
-                formatted_history,
-                request.llm_choice.value,
-                request.use_internet_search
-            )
-        elif request.rag_variant == RAGVariant.HYBRID:
-            response, sources = await rag_service.hybrid_rag(
-                request.message,
-                formatted_history,
-                request.llm_choice.value,
-                request.use_internet_search
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Invalid RAG variant")
+        # Use all uploaded documents as context (no need to specify file path);
+        # identical concurrent requests are coalesced inside rag_service.answer
+        response, sources, context_tokens, dropped_stages = await until_disconnect(http_request, rag_service.answer(
+            request.rag_variant.value,
+            request.message,
+            formatted_history,
+            request.llm_choice.value,
+            request.use_internet_search,
+            request.use_cache
+        ))
         
         processing_time = time.time() - start_time
         
         print(f"✅ Response generated: {len(response)} chars, {len(sources)} sources, {processing_time:.2f}s")
+        stage_timings = timings.as_dict()
+        log_rag_operation(
+            request.rag_variant.value, request.message, len(sources), processing_time, stage_timings,
+            endpoint="/chat", llm=request.llm_choice.value, dropped_stages=dropped_stages
+        )
         
         return ChatResponse(
             response=response,
             sources=sources,
-            processing_time=processing_time
+            processing_time=processing_time,
+            context_tokens=context_tokens,
+            dropped_stages=dropped_stages,
+            timings=stage_timings
         )
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=deadline_detail(e))
     except Exception as e:
         print(f"❌ Chat endpoint error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Chat processing error: {str(e)}")
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Same as /chat but streams the answer as server-sent events:
+    `sources` (sources, context_tokens, dropped_stages, retrieval_time) as soon as retrieval
+    is done, then one `token` event per generated delta, and a final `done` with
+    processing_time. Failures after the stream has started arrive as an `error` event.
+    The deadline bounds retrieval; a client disconnect stops the stream and generation.
+    """
+    print(f"🔍 Received streaming chat request - Message: {request.message}, LLM: {request.llm_choice}, RAG: {request.rag_variant}")
+    
+    start_time = time.time()
+    formatted_history = normalize_conversation_history(request.conversation_history)
+    
+    async def event_stream():
+        deadline = start_deadline(request.deadline_seconds)
+        timings = start_timings()
+        try:
+            prompt, sources, context_tokens = await rag_service.prepare(
+                request.rag_variant.value,
+                request.message,
+                formatted_history,
+                request.llm_choice.value,
+                request.use_internet_search
+            )
+            yield sse_event("sources", {
+                "sources": sources,
+                "context_tokens": context_tokens,
+                "dropped_stages": deadline.dropped,
+                "retrieval_time": time.time() - start_time
+            })
+            
+            # the compacted history is part of the prompt already
+            tokens = llm_service.stream_response_groq(
+                prompt, request.llm_choice.value, [], request.use_cache
+            )
+            async for token in tokens:
+                yield sse_event("token", {"text": token})
+            
+            processing_time = time.time() - start_time
+            stage_timings = timings.as_dict()
+            log_rag_operation(
+                request.rag_variant.value, request.message, len(sources), processing_time, stage_timings,
+                endpoint="/chat/stream", llm=request.llm_choice.value, dropped_stages=deadline.dropped
+            )
+            yield sse_event("done", {"processing_time": processing_time, "timings": stage_timings})
+        except Exception as e:
+            print(f"❌ Streaming chat error: {str(e)}")
+            yield sse_event("error", {"detail": f"Chat processing error: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # no proxy buffering, otherwise tokens arrive in one lump at the end
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # New direct chat endpoint - uses ALL uploaded documents automatically
 @app.post("/direct-chat")
 async def direct_chat(
+    http_request: Request,
     message: str = Query(..., description="Your message to the AI"),
     llm: str = Query("llama2-70b", description="LLM to use", choices=["llama2-70b", "gpt-oss-120b", "gemma-7b", "llama3-70b"]),
     rag: str = Query("vanilla", description="RAG variant to use", choices=["vanilla", "knowledge_graph", "hybrid"]),
-    use_internet: bool = Query(False, description="Enable internet search")
+    use_internet: bool = Query(False, description="Enable internet search"),
+    use_cache: bool = Query(True, description="Serve identical prompts from the completion cache"),
+    deadline_seconds: Optional[float] = Query(None, description="End-to-end time budget in seconds")
     # No file_path parameter needed - uses all uploaded documents
 ):
     """Direct chat endpoint that uses ALL previously uploaded documents"""
@@ -118,7 +228,8 @@ async def direct_chat(
             "conversation_history": [],
             "llm_choice": llm,
             "rag_variant": rag,
-            "use_internet_search": use_internet
+            "use_internet_search": use_internet,
+            "use_cache": use_cache
         }
         
         # Create ChatRequest object
@@ -126,92 +237,131 @@ async def direct_chat(
         
         # Call chat logic directly
         start_time = time.time()
+        start_deadline(deadline_seconds)
+        timings = start_timings()
         formatted_history = normalize_conversation_history(chat_request.conversation_history)
         
-        if rag == "vanilla":
-            response, sources = await rag_service.vanilla_rag(
-                message, 
-                formatted_history,
-                llm,
-                use_internet
-            )
-        elif rag == "knowledge_graph":
-            response, sources = await rag_service.knowledge_graph_rag(
-                message,
-                formatted_history,
-                llm,
-                use_internet
-            )
-        elif rag == "hybrid":
-            response, sources = await rag_service.hybrid_rag(
-                message,
-                formatted_history,
-                llm,
-                use_internet
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Invalid RAG variant")
+        response, sources, context_tokens, dropped_stages = await until_disconnect(http_request, rag_service.answer(
+            rag,
+            message,
+            formatted_history,
+            llm,
+            use_internet,
+            use_cache
+        ))
         
         processing_time = time.time() - start_time
+        stage_timings = timings.as_dict()
+        log_rag_operation(
+            rag, message, len(sources), processing_time, stage_timings,
+            endpoint="/direct-chat", llm=llm, dropped_stages=dropped_stages
+        )
         
         return {
             "response": response,
             "sources": sources,
             "processing_time": processing_time,
+            "context_tokens": context_tokens,
+            "dropped_stages": dropped_stages,
+            "timings": stage_timings,
             "llm_used": llm,
             "rag_used": rag,
             "internet_search": use_internet,
             "available_documents": len(UPLOADED_DOCUMENTS)
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=deadline_detail(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Direct chat error: {str(e)}")
 
-@app.post("/upload")
+async def spool_upload(file: UploadFile, file_path: str) -> int:
+    """
+    Stream an upload to disk in fixed-size chunks, enforcing MAX_UPLOAD_BYTES. The
+    file is opened, written and closed on the ingest pool so a slow disk never
+    blocks the event loop.
+    """
+    written = 0
+    buffer = await ingest_executor.run(open, file_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > settings.MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large; limit is {settings.MAX_UPLOAD_BYTES} bytes"
+                )
+            await ingest_executor.run(buffer.write, chunk)
+    finally:
+        await ingest_executor.run(buffer.close)
+    return written
+
+def register_document(file_name: str, file_type: str, chunks_processed: int, **extra) -> str:
+    """Record an ingested document so it shows up in /documents"""
+    document_id = str(uuid.uuid4())
+    UPLOADED_DOCUMENTS.add(document_id)
+    DOCUMENT_METADATA[document_id] = {
+        "file_name": file_name,
+        "file_type": file_type,
+        "upload_time": time.time(),
+        "chunks_processed": chunks_processed,
+        **extra
+    }
+    return document_id
+
+def enqueue_ingestion(file_path: str, file_name: str, cleanup: bool, **extra) -> IngestionJobResponse:
+    """Queue a file for background ingestion and register it once the job completes"""
+    file_type = file_name.split('.')[-1].lower()
+    
+    def on_complete(job):
+        job.document_id = register_document(
+            file_name, file_type, job.progress.chunks_upserted, job_id=job.job_id, **extra
+        )
+    
+    job = ingestion_job_queue.submit(file_path, file_name, cleanup=cleanup, on_complete=on_complete)
+    return IngestionJobResponse(
+        message="Document queued for ingestion; poll status_url for progress",
+        job_id=job.job_id,
+        file_name=file_name,
+        status_url=f"/jobs/{job.job_id}"
+    )
+
+@app.post("/upload", response_model=IngestionJobResponse, status_code=202)
 async def upload_document(file: UploadFile = File(...)):
-    """Upload document via file upload - stores it for future chats"""
+    """Upload document via file upload - queued for ingestion and stored for future chats"""
+    file_path = None
     try:
         os.makedirs("uploads", exist_ok=True)
         
         file_extension = file.filename.split('.')[-1]
         file_path = f"uploads/{uuid.uuid4()}.{file_extension}"
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        await spool_upload(file, file_path)
         
-        documents = await document_processor.process_document(file_path, file.filename)
-        chunks_processed = await vector_store_service.add_documents(documents)
-        
-        if chunks_processed == 0:
-            last_err = getattr(vector_store_service, "get_last_init_error", lambda: None)()
-            raise HTTPException(status_code=500, detail=f"Failed to ingest document; chunks_processed=0; last_error={last_err}")
-
-        # Store document info for future reference
-        document_id = str(uuid.uuid4())
-        UPLOADED_DOCUMENTS.add(document_id)
-        DOCUMENT_METADATA[document_id] = {
-            "file_name": file.filename,
-            "file_type": file_extension,
-            "upload_time": time.time(),
-            "chunks_processed": chunks_processed
-        }
-        
-        os.remove(file_path)
-        
-        return DocumentUploadResponse(
-            message="Document processed successfully and stored for future chats",
-            document_id=document_id,
-            chunks_processed=chunks_processed
-        )
+        # the job owns the spooled file from here on and deletes it when done
+        response = enqueue_ingestion(file_path, file.filename, cleanup=True)
+        file_path = None
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
 
 # New direct upload endpoint with file path
-@app.post("/direct-upload")
+@app.post("/direct-upload", response_model=IngestionJobResponse, status_code=202)
 async def direct_upload(file_path: str = Query(..., description="Full path to the document file")):
-    """Direct upload endpoint using file path - stores it for future chats"""
+    """Direct upload endpoint using file path - queued for ingestion and stored for future chats"""
     try:
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
@@ -232,35 +382,60 @@ async def direct_upload(file_path: str = Query(..., description="Full path to th
         import shutil
         shutil.copy2(file_path, temp_file_path)
         
-        # Process document
-        documents = await document_processor.process_document(temp_file_path, file_name)
-        chunks_processed = await vector_store_service.add_documents(documents)
-        
-        # Store document info
-        document_id = str(uuid.uuid4())
-        UPLOADED_DOCUMENTS.add(document_id)
-        DOCUMENT_METADATA[document_id] = {
-            "file_name": file_name,
-            "file_type": file_extension,
-            "upload_time": time.time(),
-            "chunks_processed": chunks_processed,
-            "original_path": file_path
-        }
-        
-        # Clean up
-        os.remove(temp_file_path)
-        
-        return {
-            "message": "Document uploaded successfully and stored for future chats",
-            "file_name": file_name,
-            "chunks_processed": chunks_processed,
-            "document_id": document_id,
-            "available_documents_count": len(UPLOADED_DOCUMENTS)
-        }
+        return enqueue_ingestion(temp_file_path, file_name, cleanup=True, original_path=file_path)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Report progress of a background ingestion job"""
+    job = ingestion_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return JobStatusResponse(**job.to_dict())
+
+@app.get("/jobs")
+async def list_jobs():
+    """List recent ingestion jobs"""
+    return {
+        "queue_depth": ingestion_job_queue.queue_depth(),
+        "jobs": [job.to_dict() for job in ingestion_job_queue.list_jobs()]
+    }
+
+def register_bulk_result(result: Dict[str, Any]):
+    result["document_id"] = register_document(
+        result["file_name"],
+        result["file_name"].split('.')[-1].lower(),
+        result["chunks_processed"],
+        original_path=result["file_path"]
+    )
+
+@app.post("/bulk-upload")
+async def bulk_upload(request: BulkUploadRequest):
+    """Ingest many files in place (list of paths, globs or a directory) with parallel workers"""
+    file_paths = bulk_ingestion_service.resolve_paths(request.paths, request.directory, request.pattern)
+    if not file_paths:
+        raise HTTPException(status_code=404, detail="No supported files matched the given paths")
+    try:
+        return await bulk_ingestion_service.ingest(
+            file_paths, workers=request.workers, on_file_done=register_bulk_result
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk upload error: {str(e)}")
+
+@app.post("/sync")
+async def sync_folder(folder: str = Query(..., description="Knowledge-base folder to re-ingest incrementally")):
+    """Scan a folder and embed only new/changed chunks; delete chunks that disappeared"""
+    try:
+        return await folder_sync_service.sync(folder)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sync error: {str(e)}")
+
 # New endpoint to list uploaded documents
 @app.get("/documents")
 async def list_documents():
@@ -293,6 +468,24 @@ async def clear_documents():
         "documents_removed": count
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for this worker"""
+    return {
+        "chat_coalescing": rag_service.coalescing_stats(),
+        "near_duplicates_dropped": rag_service.near_duplicates_dropped,
+        "llm_cache": completion_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_latency": latency_tracker.stats(),
+        "knowledge_graph": knowledge_graph_service.stats(),
+        "ingestion_queue_depth": ingestion_job_queue.queue_depth()
+    }
+
+@app.get("/llm-cache/stats")
+async def llm_cache_stats():
+    """Completion cache hit rate and sizes for this worker"""
+    return completion_cache.stats()
+
 @app.get("/health")
 async def health_check():
     return {
@@ -307,11 +500,18 @@ async def root():
         "message": "Multi-Modal RAG Chatbot API",
         "endpoints": {
             "POST /chat": "Chat with the AI (JSON body)",
+            "POST /chat/stream": "Chat with the AI, streamed as server-sent events",
             "POST /direct-chat": "Direct chat using ALL uploaded documents",
-            "POST /upload": "Upload document via file upload",
-            "POST /direct-upload": "Upload document via file path", 
+            "POST /upload": "Upload document via file upload (returns an ingestion job id)",
+            "POST /direct-upload": "Upload document via file path (returns an ingestion job id)",
+            "GET /jobs/{job_id}": "Ingestion job progress",
+            "GET /jobs": "List recent ingestion jobs",
+            "POST /bulk-upload": "Ingest many files/directories in place with parallel workers",
+            "POST /sync": "Incrementally re-ingest a folder (only changed chunks)",
             "GET /documents": "List all uploaded documents",
             "DELETE /documents": "Clear all uploaded documents",
+            "GET /metrics": "Runtime counters (request coalescing, cache, LLM scheduler/latency, queues)",
+            "GET /llm-cache/stats": "LLM completion cache hit rate and bytes",
             "GET /health": "Basic health check",
             "GET /": "This information page"
         },
@@ -322,11 +522,8 @@ async def root():
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-    
-    
-    
+    # the CLI is app/__main__.py; see there for why it can't run from this module
+    raise SystemExit("Run the CLI as `python -m app` (serve, sync, ingest), e.g. python -m app serve")
 
 #    How to run
 #    uvicorn app.main3:app --host 0.0.0.0 --port 8000
@@ -336,4 +533,6 @@ if __name__ == "__main__":
 #    $ curl http://localhost:8000/documents
 #    $ curl -X POST "http://localhost:8000/direct-chat?message=What%20is%20Annealed%20Language%20Learning%20in%20mmbert?&llm=gpt-oss-120b&rag=vanilla&use_internet=true"
 #    $ curl -X DELETE http://localhost:8000/documents
+#    $ python -m app sync /path/to/knowledge-base
+#    $ python -m app ingest /path/to/corpus "/data/reports/*.pdf" --workers 8
 
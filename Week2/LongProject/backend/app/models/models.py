@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 from enum import Enum
 
 class LLMChoice(str, Enum):
@@ -24,17 +24,51 @@ class ChatRequest(BaseModel):
     llm_choice: LLMChoice
     rag_variant: RAGVariant
     use_internet_search: bool = False
+    use_cache: bool = True  # set False to force a fresh LLM completion
+    deadline_seconds: Optional[float] = None  # end-to-end budget; defaults to REQUEST_DEADLINE_SECONDS
 
 class ChatResponse(BaseModel):
     response: str
     sources: List[str]
     processing_time: float
+    # tokens sent per prompt section (documents, internet, history, question, ...) and the budget
+    context_tokens: Optional[Dict[str, int]] = None
+    # optional stages skipped or cut to meet the request deadline
+    dropped_stages: List[str] = []
+    # seconds per stage (retrieval, embedding, pinecone, bm25_build, web_search, llm_first_token, ...);
+    # concurrent stages overlap, "total" is the wall-clock time
+    timings: Optional[Dict[str, float]] = None
 
 class DocumentUploadResponse(BaseModel):
     message: str
     document_id: str
     chunks_processed: int
 
+class IngestionJobResponse(BaseModel):
+    message: str
+    job_id: str
+    file_name: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    file_name: str
+    status: str
+    stage: str
+    pages_done: int
+    chunks_embedded: int
+    chunks_upserted: int
+    elapsed_seconds: Optional[float] = None
+    chunks_per_second: Optional[float] = None
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkUploadRequest(BaseModel):
+    paths: List[str] = []  # files, directories or glob patterns, read in place
+    directory: Optional[str] = None
+    pattern: str = "**/*"  # applied to `directory` and to directories in `paths`
+    workers: Optional[int] = None
+
 class ConfigUpdate(BaseModel):
     llm_choice: LLMChoice
     rag_variant: RAGVariant
@@ -0,0 +1,85 @@
+import asyncio
+import glob
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from ..config import settings
+from .ingestion_pipeline import ingestion_pipeline, IngestionProgress
+from .embedding_batcher import embedding_batcher
+from .document_processor import SUPPORTED_EXTENSIONS
+
+class BulkIngestionService:
+    """
+    Ingests many files in place (no copy into uploads/) across a pool of
+    BULK_INGEST_WORKERS concurrent pipelines. All pipelines feed the shared
+    embedding batcher, so the embedder sees full batches even for small files.
+    """
+
+    def resolve_paths(self, paths: Optional[List[str]] = None, directory: Optional[str] = None,
+                      pattern: str = "**/*") -> List[str]:
+        """Expand explicit paths, globs and a directory+pattern into supported files"""
+        candidates: List[str] = []
+        for path in paths or []:
+            if os.path.isdir(path):
+                candidates.extend(glob.glob(os.path.join(path, pattern), recursive=True))
+            elif glob.has_magic(path):
+                candidates.extend(glob.glob(path, recursive=True))
+            else:
+                candidates.append(path)
+        if directory:
+            candidates.extend(glob.glob(os.path.join(directory, pattern), recursive=True))
+
+        resolved, seen = [], set()
+        for path in candidates:
+            path = os.path.abspath(path)
+            if path in seen or path.lower().split('.')[-1] not in SUPPORTED_EXTENSIONS:
+                continue
+            seen.add(path)
+            resolved.append(path)
+        return resolved
+
+    async def ingest(self, file_paths: List[str], workers: Optional[int] = None,
+                     on_file_done: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        semaphore = asyncio.Semaphore(workers or settings.BULK_INGEST_WORKERS)
+        start_time = time.time()
+        batches_before = embedding_batcher.batches
+
+        async def ingest_one(file_path: str) -> Dict[str, Any]:
+            async with semaphore:
+                progress = IngestionProgress()
+                file_start = time.time()
+                result = {"file_path": file_path, "file_name": os.path.basename(file_path)}
+                try:
+                    if not os.path.isfile(file_path):
+                        raise FileNotFoundError(f"File not found: {file_path}")
+                    result["chunks_processed"] = await ingestion_pipeline.ingest(
+                        file_path, result["file_name"], progress
+                    )
+                    result["status"] = "completed" if result["chunks_processed"] else "empty"
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+                    result["chunks_processed"] = progress.chunks_upserted
+                result["pages_done"] = progress.pages_done
+                result["seconds"] = time.time() - file_start
+                if on_file_done and result["status"] == "completed":
+                    on_file_done(result)
+                return result
+
+        results = await asyncio.gather(*(ingest_one(path) for path in file_paths))
+
+        elapsed = time.time() - start_time
+        total_chunks = sum(result["chunks_processed"] for result in results)
+        return {
+            "files": len(results),
+            "completed": sum(1 for result in results if result["status"] == "completed"),
+            "failed": sum(1 for result in results if result["status"] == "failed"),
+            "chunks_processed": total_chunks,
+            "embedding_batches": embedding_batcher.batches - batches_before,
+            "elapsed_seconds": elapsed,
+            "files_per_second": len(results) / elapsed if elapsed > 0 else None,
+            "chunks_per_second": total_chunks / elapsed if elapsed > 0 else None,
+            "results": results,
+        }
+
+bulk_ingestion_service = BulkIngestionService()
@@ -0,0 +1,141 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+from langchain.schema import Document
+from ..config import settings
+from ..utils.tokenization import token_spans, has_tokenizer
+
+# Regex token estimates undercount sub-word tokenizers; pad them when the real tokenizer is missing
+FALLBACK_TOKEN_RATIO = 1.3
+# Formatting around each packed item ("Document 3 (Source: ...):" etc.)
+ITEM_OVERHEAD_TOKENS = 16
+# Do not bother adding a truncated item with less room than this
+MIN_PARTIAL_TOKENS = 64
+# Web results rank below stored documents of the same retrieval rank
+INTERNET_WEIGHT = 0.8
+DEFAULT_BUDGET = 3000
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+
+class ContextPacker:
+    """
+    Fits retrieved context into a per-model token budget.
+
+    Fixed prompt parts (question + instructions, history, entity lines) are counted
+    first; the remaining budget is filled with documents and web results in order of
+    relevance (retrieval rank, web results weighted down). An item that does not fit
+    whole is cut at the last sentence boundary that fits. Token usage is reported
+    per section so prompt size, latency and cost stay predictable.
+    """
+
+    def budget_for(self, llm_choice: str) -> int:
+        return settings.CONTEXT_TOKEN_BUDGETS.get(llm_choice, DEFAULT_BUDGET)
+
+    def count(self, text: str, llm_choice: str) -> int:
+        model_name = settings.LLM_TOKENIZERS.get(llm_choice)
+        tokens = len(token_spans(text, model_name))
+        return tokens if has_tokenizer(model_name) else math.ceil(tokens * FALLBACK_TOKEN_RATIO)
+
+    def truncate(self, text: str, max_tokens: int, llm_choice: str) -> str:
+        """Longest prefix of `text` within `max_tokens`, ending on a sentence boundary if possible"""
+        model_name = settings.LLM_TOKENIZERS.get(llm_choice)
+        if not has_tokenizer(model_name):
+            max_tokens = int(max_tokens / FALLBACK_TOKEN_RATIO)
+        spans = token_spans(text, model_name)
+        if len(spans) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        limit = spans[max_tokens - 1][1]
+        cut = None
+        # search one past the limit, so a sentence or word ending exactly at it is seen
+        # (the lookahead needs the space after it)
+        for match in _SENTENCE_END.finditer(text, 0, limit + 1):
+            cut = match.end()
+        if cut is None:
+            cut = text.rfind(" ", 0, limit + 1)
+            cut = cut if cut > 0 else limit
+        return text[:cut].rstrip()
+
+    def truncate_tail(self, text: str, max_tokens: int, llm_choice: str) -> str:
+        """Longest suffix of `text` within `max_tokens`, starting after a sentence boundary if possible"""
+        model_name = settings.LLM_TOKENIZERS.get(llm_choice)
+        if not has_tokenizer(model_name):
+            max_tokens = int(max_tokens / FALLBACK_TOKEN_RATIO)
+        spans = token_spans(text, model_name)
+        if len(spans) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        limit = spans[len(spans) - max_tokens][0]
+        # start at the last character before the whitespace ahead of the limit, so a
+        # sentence ending right before the limit is seen
+        start = len(text[:limit].rstrip())
+        match = _SENTENCE_END.search(text, max(start - 1, 0))
+        if match:
+            cut = match.end()
+        else:
+            # a token that starts mid-word (sub-word piece) moves the cut to the next space
+            cut = text.find(" ", max(limit - 1, 0))
+            cut = cut if cut >= 0 else limit
+        return text[cut:].lstrip()
+
+    def pack(
+        self,
+        llm_choice: str,
+        documents: List[Document],
+        internet_results: Optional[List[Dict]] = None,
+        reserved: Optional[Dict[str, str]] = None,
+    ) -> Tuple[List[Document], List[Dict], Dict[str, int]]:
+        """
+        Returns (documents, internet_results, usage): the items that fit - possibly
+        truncated, in their original order - and the tokens used per section.
+        `reserved` maps section name -> fixed text that is always sent.
+        """
+        internet_results = internet_results or []
+        budget = self.budget_for(llm_choice)
+        usage: Dict[str, int] = {name: self.count(text or "", llm_choice) for name, text in (reserved or {}).items()}
+        remaining = budget - sum(usage.values())
+
+        candidates = []
+        for rank, doc in enumerate(documents):
+            candidates.append((1.0 / (rank + 1), "documents", rank, doc.page_content or ""))
+        for rank, result in enumerate(internet_results):
+            text = result.get("description", result.get("summary", "")) or ""
+            candidates.append((INTERNET_WEIGHT / (rank + 1), "internet", rank, text))
+        candidates.sort(key=lambda candidate: -candidate[0])
+
+        kept: Dict[Tuple[str, int], str] = {}
+        usage["documents"] = usage["internet"] = 0
+        dropped = 0
+        for _, section, rank, text in candidates:
+            cost = self.count(text, llm_choice) + ITEM_OVERHEAD_TOKENS
+            if cost > remaining:
+                room = remaining - ITEM_OVERHEAD_TOKENS
+                text = self.truncate(text, room, llm_choice) if room >= MIN_PARTIAL_TOKENS else ""
+                if not text:
+                    dropped += 1
+                    continue
+                cost = self.count(text, llm_choice) + ITEM_OVERHEAD_TOKENS
+            kept[(section, rank)] = text
+            usage[section] += cost
+            remaining -= cost
+
+        packed_docs = [
+            Document(page_content=kept[("documents", rank)], metadata=doc.metadata)
+            for rank, doc in enumerate(documents) if ("documents", rank) in kept
+        ]
+        packed_internet = []
+        for rank, result in enumerate(internet_results):
+            if ("internet", rank) in kept:
+                result = dict(result)
+                result["description"] = kept[("internet", rank)]
+                result.pop("summary", None)
+                packed_internet.append(result)
+
+        usage["items_dropped"] = dropped
+        usage["total"] = budget - remaining
+        usage["budget"] = budget
+        return packed_docs, packed_internet, usage
+
+context_packer = ContextPacker()
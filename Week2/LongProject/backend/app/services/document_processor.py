@@ -1,68 +1,293 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from PIL import Image
-import pytesseract
-import os
-from typing import List
-import PyPDF2
+import re
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import List, Iterator, Tuple, Dict, Any, Optional
+from ..config import settings
+from ..utils.executors import ingest_executor
+from .pdf_pages import iter_pdf_pages
+from .ocr_worker import ocr_image, ocr_pdf_page
+from .text_splitter import TokenTextSplitter
+
+# File extensions DocumentProcessor can ingest; folder sync and bulk ingestion filter on it
+SUPPORTED_EXTENSIONS = {"txt", "md", "pdf", "docx", "jpg", "jpeg", "png", "bmp"}
+
+# Plain-text files are handed to the splitter in sections of roughly this many
+# characters, so a large .txt never has to be held in memory as a whole
+TEXT_SECTION_CHARS = 64 * 1024
+
+# WordprocessingML namespace and the paragraph styles treated as headings
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+# Text boxes are parsed as paragraphs of their own, and mc:Fallback repeats the
+# mc:Choice content (VML copy of a drawing), so neither counts towards the enclosing text
+DOCX_SKIP_TEXT = {W_NS + "txbxContent", MC_NS + "Fallback"}
+HEADING_STYLE = re.compile(r"^(?:heading\s?(\d)|title)$", re.IGNORECASE)
 
 class DocumentProcessor:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=80,
-            length_function=len
+        # chunk sizes are in embedding-model tokens, so chunks always fit the embedder's window
+        self.text_splitter = TokenTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            model_name=settings.EMBEDDING_MODEL
         )
+        self._ocr_pool: Optional[ProcessPoolExecutor] = None
+        self._ocr_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._ocr_lock = threading.Lock()
     
+    # The process_* coroutines hand all blocking file I/O, parsing, splitting and
+    # OCR waits to the bounded ingestion executor so the event loop stays free.
     async def process_text_file(self, file_path: str, filename: str) -> List[Document]:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-        
-        texts = self.text_splitter.split_text(text)
-        documents = [
-            Document(
-                page_content=text,
-                metadata={"source": filename, "type": "text"}
-            ) for text in texts
-        ]
-        return documents
+        return await ingest_executor.run(self._split_sections, self._iter_text_sections(file_path, filename))
     
     async def process_pdf_file(self, file_path: str, filename: str) -> List[Document]:
-        documents = []
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num, page in enumerate(pdf_reader.pages):
-                text = page.extract_text()
-                if text.strip():
-                    texts = self.text_splitter.split_text(text)
-                    for text_chunk in texts:
-                        documents.append(Document(
-                            page_content=text_chunk,
-                            metadata={
-                                "source": filename,
-                                "page": page_num + 1,
-                                "type": "pdf"
-                            }
-                        ))
-        return documents
+        return await ingest_executor.run(self._split_sections, self._iter_pdf_sections(file_path, filename))
     
     async def process_image_file(self, file_path: str, filename: str) -> List[Document]:
         try:
-            # Extract text from image using OCR
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
-            
-            if text.strip():
-                documents = [Document(
-                    page_content=text,
-                    metadata={"source": filename, "type": "image"}
-                )]
-                return documents
-            return []
+            return await ingest_executor.run(self._split_sections, self._iter_image_sections(file_path, filename))
         except Exception as e:
             print(f"Error processing image: {e}")
             return []
     
+    def _split_sections(self, sections: Iterator[Tuple[str, Dict[str, Any]]]) -> List[Document]:
+        documents = []
+        for text, metadata in sections:
+            documents.extend(self.split_section(text, metadata))
+        return documents
+    
+    # ---------- OCR ----------
+    def ocr_image(self, file_path: str) -> str:
+        """
+        OCR an image on the worker process pool, caching the text by content hash
+        (plus preprocessing settings) so re-uploads of the same image are free.
+        Blocking; run it off the event loop.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        key = f"{digest.hexdigest()}:{settings.OCR_MAX_SIDE}:{settings.OCR_BINARIZE}"
+        
+        with self._ocr_lock:
+            if key in self._ocr_cache:
+                self._ocr_cache.move_to_end(key)
+                return self._ocr_cache[key]
+        
+        text = self._get_ocr_pool().submit(
+            ocr_image, file_path, settings.OCR_MAX_SIDE, settings.OCR_BINARIZE
+        ).result()
+        
+        with self._ocr_lock:
+            self._ocr_cache[key] = text
+            while len(self._ocr_cache) > settings.OCR_CACHE_SIZE:
+                self._ocr_cache.popitem(last=False)
+        return text
+    
+    def _get_ocr_pool(self) -> ProcessPoolExecutor:
+        with self._ocr_lock:
+            if self._ocr_pool is None:
+                # spawn, not fork: the API process is multi-threaded (torch, executors)
+                self._ocr_pool = ProcessPoolExecutor(
+                    max_workers=settings.OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._ocr_pool
+    
+    def shutdown(self):
+        """Stop the OCR worker processes (they are started again on the next OCR)"""
+        with self._ocr_lock:
+            pool, self._ocr_pool = self._ocr_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    # ---------- Streaming API (used by the ingestion pipeline) ----------
+    def iter_sections(self, file_path: str, filename: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Lazily yields (text, metadata) sections of a document - one per PDF page,
+        one per ~64 KB of a text file, one per image - without reading the whole
+        file up front. Blocking; run it off the event loop.
+        """
+        file_ext = filename.lower().split('.')[-1]
+        
+        if file_ext in ['txt', 'md']:
+            yield from self._iter_text_sections(file_path, filename)
+        elif file_ext == 'pdf':
+            yield from self._iter_pdf_sections(file_path, filename)
+        elif file_ext in ['jpg', 'jpeg', 'png', 'bmp']:
+            yield from self._iter_image_sections(file_path, filename)
+        elif file_ext == 'docx':
+            yield from self._iter_docx_sections(file_path, filename)
+        else:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+    
+    def split_section(self, text: str, metadata: Dict[str, Any]) -> List[Document]:
+        return [
+            Document(page_content=chunk, metadata=dict(metadata))
+            for chunk in self.text_splitter.split_text(text)
+        ]
+    
+    def _iter_text_sections(self, file_path: str, filename: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        metadata = {"source": filename, "type": "text"}
+        buffer: List[str] = []
+        size = 0
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                buffer.append(line)
+                size += len(line)
+                if size >= TEXT_SECTION_CHARS:
+                    yield "".join(buffer), metadata
+                    buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer), metadata
+    
+    def _iter_pdf_sections(self, file_path: str, filename: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields one section per page: the embedded text layer when it is usable,
+        otherwise that single page rasterized and OCR'd on the OCR process pool.
+        """
+        pages = iter_pdf_pages(
+            file_path,
+            ocr_page=self._ocr_pdf_page,
+            window=settings.PDF_READER_WINDOW,
+            min_chars=settings.PDF_MIN_TEXT_CHARS
+        )
+        for page_number, text, method in pages:
+            if text.strip():
+                yield text, {"source": filename, "page": page_number, "type": "pdf", "extraction": method}
+    
+    def _ocr_pdf_page(self, file_path: str, page_number: int) -> str:
+        return self._get_ocr_pool().submit(ocr_pdf_page, file_path, page_number, settings.OCR_PDF_DPI).result()
+    
+    def _iter_image_sections(self, file_path: str, filename: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        text = self.ocr_image(file_path)
+        if text.strip():
+            yield text, {"source": filename, "type": "image"}
+    
+    async def process_docx_file(self, file_path: str, filename: str) -> List[Document]:
+        return await ingest_executor.run(self._split_sections, self._iter_docx_sections(file_path, filename))
+    
+    def _iter_docx_sections(self, file_path: str, filename: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream-parses word/document.xml straight out of the .docx zip with iterparse,
+        dropping each top-level paragraph/table as soon as it has been consumed, so
+        memory stays flat regardless of document size. Body text is grouped under
+        the nearest heading; every table becomes its own section (rows as
+        "cell | cell" lines). Heading and table info is attached as metadata.
+        """
+        base = {"source": filename, "type": "docx"}
+        heading_path: List[Tuple[int, str]] = []  # (level, text) from outermost to innermost
+        paragraphs: List[str] = []
+        size = 0
+        table_index = 0
+        table_rows: List[str] = []
+        table_size = 0
+        
+        def section_metadata(kind: str) -> Dict[str, Any]:
+            metadata = {**base, "section": kind}
+            if heading_path:
+                # Pinecone metadata cannot hold None, so heading keys are only set when known
+                metadata["heading"] = heading_path[-1][1]
+                metadata["heading_path"] = [text for _, text in heading_path]
+            return metadata
+        
+        with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml_file:
+            stack: List[ET.Element] = []
+            table_depth = 0
+            for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem)
+                    if elem.tag == W_NS + "tbl":
+                        table_depth += 1
+                        if table_depth == 1 and paragraphs:
+                            # keep reading order: text before the table is emitted first
+                            yield "\n".join(paragraphs), section_metadata("text")
+                            paragraphs, size = [], 0
+                    continue
+                
+                stack.pop()
+                parent = stack[-1] if stack else None
+                
+                if elem.tag == W_NS + "tbl":
+                    table_depth -= 1
+                    if table_depth == 0:
+                        if table_rows:
+                            yield "\n".join(table_rows), {**section_metadata("table"), "table_index": table_index}
+                        table_index += 1
+                        table_rows, table_size = [], 0
+                elif elem.tag == W_NS + "tr" and table_depth == 1:
+                    cells = [self._docx_text(cell) for cell in elem.findall(W_NS + "tc")]
+                    row = " | ".join(cell for cell in cells if cell)
+                    if row:
+                        table_rows.append(row)
+                        table_size += len(row)
+                    if table_size >= TEXT_SECTION_CHARS:
+                        yield "\n".join(table_rows), {**section_metadata("table"), "table_index": table_index}
+                        table_rows, table_size = [], 0
+                    parent.remove(elem)
+                elif elem.tag == W_NS + "p" and table_depth == 0:
+                    if any(node.tag == MC_NS + "Fallback" for node in stack):
+                        # duplicate of a text box already read from mc:Choice
+                        continue
+                    text = self._docx_text(elem)
+                    level = self._docx_heading_level(elem)
+                    if level is not None and text:
+                        if paragraphs:
+                            yield "\n".join(paragraphs), section_metadata("text")
+                            paragraphs, size = [], 0
+                        while heading_path and heading_path[-1][0] >= level:
+                            heading_path.pop()
+                        heading_path.append((level, text))
+                    elif text:
+                        paragraphs.append(text)
+                        size += len(text)
+                        if size >= TEXT_SECTION_CHARS:
+                            yield "\n".join(paragraphs), section_metadata("text")
+                            paragraphs, size = [], 0
+                
+                # free everything that hangs directly off <w:body> once it has been consumed
+                if parent is not None and parent.tag == W_NS + "body" and table_depth == 0:
+                    parent.remove(elem)
+        
+        if paragraphs:
+            yield "\n".join(paragraphs), section_metadata("text")
+    
+    @staticmethod
+    def _docx_text(elem: ET.Element) -> str:
+        parts = []
+        
+        def walk(node: ET.Element):
+            for child in node:
+                if child.tag in DOCX_SKIP_TEXT:
+                    continue
+                if child.tag == W_NS + "t" and child.text:
+                    parts.append(child.text)
+                elif child.tag == W_NS + "tab":
+                    parts.append("\t")
+                elif child.tag in (W_NS + "br", W_NS + "p") and parts:
+                    parts.append("\n" if child.tag == W_NS + "br" else " ")
+                walk(child)
+        
+        walk(elem)
+        return "".join(parts).strip()
+    
+    @staticmethod
+    def _docx_heading_level(paragraph: ET.Element) -> Optional[int]:
+        """0 for Title, n for "Heading n", None for body paragraphs"""
+        style = paragraph.find(f"{W_NS}pPr/{W_NS}pStyle")
+        if style is None:
+            return None
+        match = HEADING_STYLE.match(style.get(W_NS + "val", ""))
+        if not match:
+            return None
+        return int(match.group(1)) if match.group(1) else 0
+    
     async def process_document(self, file_path: str, filename: str) -> List[Document]:
         file_ext = filename.lower().split('.')[-1]
         
@@ -76,8 +301,6 @@ class DocumentProcessor:
             return await self.process_docx_file(file_path, filename)
         else:
             raise ValueError(f"Unsupported file type: {file_ext}")
-        
-        
-# Make process_docx_file func
+
 
 document_processor = DocumentProcessor()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import asyncio
+from typing import List, Optional, Tuple
+from langchain.schema import Document
+from ..config import settings
+from .vector_store import vector_store_service
+from ..utils.executors import ingest_executor
+
+class EmbeddingBatcher:
+    """
+    Process-wide embedding batcher. Every ingestion (uploads, bulk loads, folder
+    syncs) submits its chunks here; a single consumer coalesces submissions from
+    all concurrent files into batches of up to EMBED_BATCH_SIZE, waiting at most
+    EMBED_LINGER_MS for a batch to fill, and embeds each batch in one model call.
+    Many small files therefore still run the embedder at full batch efficiency.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, linger_ms: Optional[int] = None):
+        self.batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        self.linger = (linger_ms if linger_ms is not None else settings.EMBED_LINGER_MS) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.chunks = 0
+
+    async def embed(self, documents: List[Document]) -> List[List[float]]:
+        if not documents:
+            return []
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((documents, future))
+        return await future
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending: List[Tuple[List[Document], asyncio.Future]] = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.linger
+            while size < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            # callers that were cancelled while queued don't get embedded
+            pending = [(docs, future) for docs, future in pending if not future.done()]
+            if not pending:
+                continue
+            batch = [doc for docs, _ in pending for doc in docs]
+            try:
+                vectors = await ingest_executor.run(vector_store_service.embed_documents, batch)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.chunks += len(batch)
+            offset = 0
+            for docs, future in pending:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(docs)])
+                offset += len(docs)
+
+embedding_batcher = EmbeddingBatcher()
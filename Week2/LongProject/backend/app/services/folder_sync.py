@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+from langchain.schema import Document
+from ..config import settings
+from .document_processor import document_processor, SUPPORTED_EXTENSIONS
+from .vector_store import vector_store_service
+from .embedding_batcher import embedding_batcher
+from .knowledge_graph import knowledge_graph_service
+from ..utils.executors import ingest_executor
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _chunk_hash(doc: Document) -> str:
+    # metadata is part of the identity so a paragraph moving to another page is re-indexed
+    payload = doc.page_content + "\x00" + json.dumps(doc.metadata or {}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class FolderSyncService:
+    """
+    Incremental re-ingestion of a knowledge-base folder.
+
+    A JSON manifest remembers, per file, its mtime, size, content hash and the
+    hashes of the chunks it produced (each hash doubles as a stable Pinecone id).
+    A sync skips files whose mtime/size (or, failing that, content hash) are
+    unchanged; for changed files only chunks whose hash is new are embedded and
+    upserted, and chunks that disappeared are deleted. Files removed from the
+    folder have all their chunks deleted. Cost is proportional to what changed.
+    """
+
+    def __init__(self, manifest_path: Optional[str] = None):
+        self.manifest_path = manifest_path or settings.SYNC_MANIFEST_PATH
+        self._lock = asyncio.Lock()
+
+    async def sync(self, folder: str) -> Dict[str, Any]:
+        folder = os.path.abspath(folder)
+        if not os.path.isdir(folder):
+            raise ValueError(f"Not a directory: {folder}")
+
+        async with self._lock:
+            start_time = time.time()
+            manifest = await ingest_executor.run(self._load_manifest)
+            summary = {
+                "folder": folder, "scanned": 0, "new": 0, "changed": 0, "unchanged": 0,
+                "deleted": 0, "chunks_added": 0, "chunks_removed": 0, "chunks_unchanged": 0,
+                "errors": [],
+            }
+
+            seen: Set[str] = set()
+            unsaved, saved_at = 0, time.monotonic()
+            for file_path in await ingest_executor.run(self._scan, folder):
+                seen.add(file_path)
+                summary["scanned"] += 1
+                try:
+                    if await self._sync_file(file_path, manifest, summary):
+                        unsaved += 1
+                except Exception as e:
+                    print(f"❌ Sync failed for {file_path}: {e}")
+                    summary["errors"].append({"file": file_path, "error": str(e)})
+                # checkpoint every few changed files / seconds so an interrupted sync resumes cheaply
+                if unsaved and (unsaved >= settings.SYNC_CHECKPOINT_FILES
+                                or time.monotonic() - saved_at >= settings.SYNC_CHECKPOINT_SECONDS):
+                    await self._checkpoint(manifest)
+                    unsaved, saved_at = 0, time.monotonic()
+
+            # files that used to live under this folder but are gone now
+            prefix = folder + os.sep
+            for file_path in [p for p in manifest if p.startswith(prefix) and p not in seen]:
+                removed = list(manifest[file_path]["chunks"])
+                await ingest_executor.run(vector_store_service.delete_ids, removed)
+                summary["chunks_removed"] += len(removed)
+                summary["deleted"] += 1
+                del manifest[file_path]
+            await self._checkpoint(manifest)
+
+            summary["elapsed_seconds"] = time.time() - start_time
+            return summary
+
+    # ---------- Internals ----------
+    def _scan(self, folder: str) -> List[str]:
+        paths = []
+        for root, _, files in os.walk(folder):
+            for name in files:
+                if name.lower().split('.')[-1] in SUPPORTED_EXTENSIONS:
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    async def _sync_file(self, file_path: str, manifest: Dict[str, Any], summary: Dict[str, Any]) -> bool:
+        """Bring one file up to date; returns True when its manifest entry changed."""
+        stat = os.stat(file_path)
+        entry = manifest.get(file_path)
+
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            summary["unchanged"] += 1
+            summary["chunks_unchanged"] += len(entry["chunks"])
+            return False
+
+        sha256 = await ingest_executor.run(_file_sha256, file_path)
+        if entry and entry["sha256"] == sha256:
+            # touched but identical: just refresh the stat fingerprint
+            entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+            summary["unchanged"] += 1
+            summary["chunks_unchanged"] += len(entry["chunks"])
+            return True
+
+        old_chunks: Set[str] = set(entry["chunks"]) if entry else set()
+        path_key = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+        new_chunks: Set[str] = set()
+        pending: List[Document] = []
+        pending_ids: List[str] = []
+
+        sections = document_processor.iter_sections(file_path, os.path.basename(file_path))
+        sentinel = object()
+        while True:
+            section = await ingest_executor.run(next, sections, sentinel)
+            if section is sentinel:
+                break
+            text, metadata = section
+            for doc in await ingest_executor.run(document_processor.split_section, text, metadata):
+                chunk_id = f"{path_key}-{_chunk_hash(doc)}"
+                if chunk_id in new_chunks:
+                    continue
+                new_chunks.add(chunk_id)
+                if chunk_id in old_chunks:
+                    continue
+                doc.metadata["chunk_id"] = chunk_id
+                pending.append(doc)
+                pending_ids.append(chunk_id)
+                if len(pending) >= settings.INGEST_BATCH_SIZE:
+                    summary["chunks_added"] += await self._embed_and_upsert(pending, pending_ids)
+                    pending, pending_ids = [], []
+        if pending:
+            summary["chunks_added"] += await self._embed_and_upsert(pending, pending_ids)
+
+        removed = sorted(old_chunks - new_chunks)
+        await ingest_executor.run(vector_store_service.delete_ids, removed)
+        summary["chunks_removed"] += len(removed)
+        summary["chunks_unchanged"] += len(old_chunks & new_chunks)
+        summary["changed" if entry else "new"] += 1
+
+        manifest[file_path] = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha256": sha256,
+            "chunks": sorted(new_chunks),
+        }
+        return True
+
+    async def _embed_and_upsert(self, documents: List[Document], ids: List[str]) -> int:
+        embeddings = await embedding_batcher.embed(documents)
+        return await ingest_executor.run(vector_store_service.upsert_embedded, documents, embeddings, ids)
+
+    async def _checkpoint(self, manifest: Dict[str, Any]):
+        # the sync holds self._lock, so nothing mutates the manifest while the executor writes it
+        await ingest_executor.run(self._save_manifest, manifest)
+        await ingest_executor.run(knowledge_graph_service.flush)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        # write-then-rename so a crash mid-sync never leaves a truncated manifest
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, self.manifest_path)
+
+folder_sync_service = FolderSyncService()
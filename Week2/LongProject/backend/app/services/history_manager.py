@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from ..config import settings
+from .context_packer import context_packer
+from .llm_service import llm_service
+from .llm_scheduler import Priority
+from ..utils.executors import query_executor
+from ..utils.deadline import clear_deadline
+from ..utils.timings import timed, clear_timings
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant. "
+    "Keep facts, names, numbers, decisions and open questions; drop greetings and filler. "
+    "Reply with the updated summary only, in at most {words} words.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New messages:\n{messages}"
+)
+
+_FIRST_SENTENCE = re.compile(r"^(.{1,200}?[.!?])(\s|$)", re.S)
+
+class HistoryManager:
+    """
+    Renders conversation history for the prompt under a hard token ceiling.
+
+    The most recent messages are kept verbatim. Everything older is folded, in
+    blocks of HISTORY_FOLD_BLOCK messages, into a running summary that is updated
+    incrementally: each summary is cached under a hash of the messages it covers,
+    so the next turn of the same conversation only summarizes the newly folded
+    block. Summaries are produced in the background at BULK priority; until one is
+    ready the turn uses the last cached summary plus a one-sentence digest of the
+    messages it does not cover yet, so summarizing never adds latency to a turn.
+    A block whose fold failed is retried with exponential backoff, not every turn.
+    """
+
+    def __init__(self):
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._folding: Dict[str, asyncio.Task] = {}
+        # block key -> (consecutive failures, monotonic time of the next attempt)
+        self._failures: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    async def render(self, conversation_history: List, llm_choice: str) -> str:
+        messages = [self._normalize(msg) for msg in conversation_history or []]
+        if not messages:
+            return "(no prior messages)"
+
+        with timed("history"):
+            recent_count = settings.HISTORY_RECENT_MESSAGES
+            block = settings.HISTORY_FOLD_BLOCK
+            folded = max(0, (len(messages) - recent_count) // block * block)
+            summary = self._summary_for(messages[:folded]) if folded else ""
+            return await query_executor.run(self._fit, summary, messages[folded:], llm_choice)
+
+    def format_messages(self, messages: List[Tuple[bool, str]]) -> str:
+        return "\n".join(f"{'User' if is_user else 'Assistant'}: {text}" for is_user, text in messages)
+
+    # ---------- Summaries ----------
+    def _summary_for(self, folded: List[Tuple[bool, str]]) -> str:
+        """Best summary available now for `folded`; schedules the missing folds"""
+        block = settings.HISTORY_FOLD_BLOCK
+        keys = self._block_keys(folded)
+        cached = len(keys) - 1
+        while cached >= 0 and keys[cached] not in self._summaries:
+            cached -= 1
+        summary = self._summaries[keys[cached]] if cached >= 0 else ""
+        if cached >= 0:
+            self._summaries.move_to_end(keys[cached])
+        if cached == len(keys) - 1:
+            return summary
+
+        _, retry_at = self._failures.get(keys[cached + 1], (0, 0.0))
+        if keys[-1] not in self._folding and time.monotonic() >= retry_at:
+            task = asyncio.create_task(self._fold(folded, keys, cached, summary))
+            self._folding[keys[-1]] = task
+            task.add_done_callback(lambda _: self._folding.pop(keys[-1], None))
+        pending = folded[(cached + 1) * block:]
+        digest = self.format_messages([(is_user, self._first_sentence(text)) for is_user, text in pending])
+        return f"{summary}\n{digest}".strip()
+
+    async def _fold(self, folded: List[Tuple[bool, str]], keys: List[str], cached: int, summary: str):
+        block = settings.HISTORY_FOLD_BLOCK
+        # runs past the turn that started it; the turn's deadline and timings don't apply
+        clear_deadline()
+        clear_timings()
+        try:
+            for index in range(cached + 1, len(keys)):
+                prompt = SUMMARY_PROMPT.format(
+                    words=int(settings.HISTORY_SUMMARY_TOKENS * 0.7),
+                    summary=summary or "(none)",
+                    messages=self.format_messages(folded[index * block:(index + 1) * block]),
+                )
+                summary = (await llm_service.complete(
+                    prompt, settings.HISTORY_SUMMARY_MODEL, [], priority=Priority.BULK
+                )).strip()
+                self._remember(keys[index], summary)
+                self._failures.pop(keys[index], None)
+        except Exception as e:
+            failures = self._failures.pop(keys[index], (0, 0.0))[0] + 1
+            delay = min(settings.HISTORY_FOLD_RETRY_SECONDS * 2 ** (failures - 1), settings.HISTORY_FOLD_RETRY_MAX_SECONDS)
+            self._failures[keys[index]] = (failures, time.monotonic() + delay)
+            while len(self._failures) > settings.HISTORY_SUMMARY_CACHE_SIZE:
+                self._failures.popitem(last=False)
+            print(f"History summary failed, using digests for the next {delay:.0f}s: {e}")
+
+    def _remember(self, key: str, summary: str):
+        self._summaries[key] = summary
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > settings.HISTORY_SUMMARY_CACHE_SIZE:
+            self._summaries.popitem(last=False)
+
+    def _block_keys(self, folded: List[Tuple[bool, str]]) -> List[str]:
+        """Chained hashes: keys[i] identifies the first (i + 1) blocks of the conversation"""
+        block = settings.HISTORY_FOLD_BLOCK
+        keys, previous = [], ""
+        for start in range(0, len(folded), block):
+            payload = previous + json.dumps(folded[start:start + block], ensure_ascii=False)
+            previous = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            keys.append(previous)
+        return keys
+
+    # ---------- Token ceiling ----------
+    def _fit(self, summary: str, recent: List[Tuple[bool, str]], llm_choice: str) -> str:
+        """Summary (capped) + as many recent messages as fit, newest first, within the ceiling"""
+        budget = settings.HISTORY_TOKEN_BUDGET
+        parts = []
+        if summary:
+            # the tail holds the newest folds and the digest of not-yet-summarized messages
+            summary = context_packer.truncate_tail(summary, settings.HISTORY_SUMMARY_TOKENS, llm_choice)
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+            budget -= context_packer.count(parts[0], llm_choice)
+
+        kept = []
+        for is_user, text in reversed(recent):
+            line = self.format_messages([(is_user, text)])
+            cost = context_packer.count(line, llm_choice)
+            if cost > budget:
+                if not kept and budget > 0:
+                    # always keep (the start of) the latest message
+                    kept.append(context_packer.truncate(line, budget, llm_choice))
+                break
+            kept.append(line)
+            budget -= cost
+        if kept:
+            parts.append("\n".join(reversed(kept)))
+        return "\n\n".join(parts)
+
+    # ---------- Helpers ----------
+    def _normalize(self, msg) -> Tuple[bool, str]:
+        if isinstance(msg, dict):
+            return bool(msg.get("is_user", False)), str(msg.get("message", "") or "")
+        return bool(getattr(msg, "is_user", False)), str(getattr(msg, "message", msg) or "")
+
+    def _first_sentence(self, text: str) -> str:
+        text = " ".join(text.split())
+        match = _FIRST_SENTENCE.match(text)
+        return match.group(1) if match else text[:200]
+
+history_manager = HistoryManager()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from ..config import settings
+from .ingestion_pipeline import ingestion_pipeline, IngestionProgress
+
+class IngestionJob:
+    def __init__(self, file_path: str, file_name: str, cleanup: bool = False,
+                 on_complete: Optional[Callable[["IngestionJob"], Any]] = None):
+        self.job_id = str(uuid.uuid4())
+        self.file_path = file_path
+        self.file_name = file_name
+        self.cleanup = cleanup  # delete file_path once the job finishes (spooled uploads)
+        self.on_complete = on_complete
+        self.progress = IngestionProgress()
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.document_id: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        throughput = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0:
+                throughput = self.progress.chunks_upserted / elapsed
+        return {
+            "job_id": self.job_id,
+            "file_name": self.file_name,
+            "status": self.status,
+            "stage": self.progress.stage,
+            "pages_done": self.progress.pages_done,
+            "chunks_embedded": self.progress.chunks_embedded,
+            "chunks_upserted": self.progress.chunks_upserted,
+            "elapsed_seconds": elapsed,
+            "chunks_per_second": throughput,
+            "document_id": self.document_id,
+            "error": self.error,
+        }
+
+class IngestionJobQueue:
+    """
+    Local worker pool for document ingestion. Endpoints enqueue a job and return its
+    id straight away; INGEST_WORKERS background tasks drain the queue through the
+    ingestion pipeline. Only that many files are ingested at once, and the pipeline's
+    blocking work runs on the bounded ingest executor, so uploads cannot starve chat.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or settings.INGEST_WORKERS
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, file_path: str, file_name: str, cleanup: bool = False,
+               on_complete: Optional[Callable[[IngestionJob], Any]] = None) -> IngestionJob:
+        self.start()
+        job = IngestionJob(file_path, file_name, cleanup=cleanup, on_complete=on_complete)
+        self._jobs[job.job_id] = job
+        self._prune()
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        return list(self._jobs.values())
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def _prune(self):
+        # forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at]
+        for job_id in finished[:max(0, len(finished) - settings.INGEST_JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            chunks = await ingestion_pipeline.ingest(job.file_path, job.file_name, job.progress)
+            if chunks == 0:
+                raise ValueError("No text could be extracted from the document")
+            if job.on_complete:
+                job.on_complete(job)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            print(f"❌ Ingestion job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.progress.stage = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if job.cleanup and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+ingestion_job_queue = IngestionJobQueue()
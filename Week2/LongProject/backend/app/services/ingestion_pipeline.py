@@ -0,0 +1,149 @@
+import asyncio
+import gc
+from typing import List, Optional
+from langchain.schema import Document
+from ..config import settings
+from .document_processor import document_processor
+from .vector_store import vector_store_service
+from .embedding_batcher import embedding_batcher
+from .knowledge_graph import knowledge_graph_service
+from ..utils.executors import ingest_executor
+from ..utils.memory import current_rss_bytes
+
+# Sentinel passed down the queues once a stage has no more work
+_DONE = object()
+
+class IngestionProgress:
+    """Counters the pipeline updates as it runs; read by the job status endpoint."""
+
+    def __init__(self):
+        self.stage = "queued"
+        self.pages_done = 0
+        self.chunks_split = 0
+        self.chunks_embedded = 0
+        self.chunks_upserted = 0
+
+class IngestionPipeline:
+    """
+    Streams a document through parse -> split -> embed -> upsert.
+
+    Each stage runs as its own task and hands work to the next one through a
+    bounded asyncio.Queue, so at most a few batches of chunks are alive at any
+    time (peak memory is O(batch), not O(file)) and the first batches are already
+    searchable in Pinecone while later pages are still being parsed.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, queue_size: Optional[int] = None):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+
+    async def ingest(self, file_path: str, filename: str, progress: Optional[IngestionProgress] = None) -> int:
+        """Run the pipeline for one file and return the number of chunks upserted."""
+        progress = progress or IngestionProgress()
+        progress.stage = "parsing"
+        section_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        batch_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        vector_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        queues = (section_queue, batch_queue, vector_queue)
+        tasks = [
+            asyncio.create_task(self._parse_stage(file_path, filename, section_queue, progress, queues)),
+            asyncio.create_task(self._split_stage(section_queue, batch_queue, progress)),
+            asyncio.create_task(self._embed_stage(batch_queue, vector_queue, progress)),
+            asyncio.create_task(self._upsert_stage(vector_queue, progress)),
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # one stage failed (or we were cancelled): stop the others so nothing blocks on a full queue
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        progress.stage = "completed"
+        return results[-1]
+
+    # ---------- Stages ----------
+    async def _parse_stage(self, file_path: str, filename: str, out_queue: asyncio.Queue,
+                           progress: IngestionProgress, queues=()):
+        sections = document_processor.iter_sections(file_path, filename)
+        try:
+            while True:
+                await self._wait_for_memory(queues)
+                # pull one page/section at a time in a worker thread; blocks here when the splitter falls behind
+                section = await ingest_executor.run(next, sections, _DONE)
+                if section is _DONE:
+                    break
+                progress.pages_done += 1
+                await out_queue.put(section)
+        finally:
+            try:
+                sections.close()
+            except ValueError:
+                # cancelled while a worker thread is still inside next(); it finishes on its own
+                pass
+        progress.stage = "embedding"
+        await out_queue.put(_DONE)
+
+    async def _wait_for_memory(self, queues):
+        """
+        RSS cap: before parsing another page, wait while the process is above
+        INGEST_MAX_RSS_MB and downstream stages still have buffered work to drain.
+        Once everything is drained we carry on regardless, so a cap set below the
+        baseline footprint slows ingestion down but can never deadlock it.
+        """
+        cap = settings.INGEST_MAX_RSS_MB * 1024 * 1024
+        if not cap:
+            return
+        rss = current_rss_bytes()
+        if rss is None or rss <= cap:
+            return
+        while any(not queue.empty() for queue in queues):
+            await asyncio.sleep(0.05)
+            rss = current_rss_bytes()
+            if rss is None or rss <= cap:
+                return
+        gc.collect()
+
+    async def _split_stage(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue, progress: IngestionProgress):
+        batch: List[Document] = []
+        while True:
+            section = await in_queue.get()
+            if section is _DONE:
+                break
+            text, metadata = section
+            chunks = await ingest_executor.run(document_processor.split_section, text, metadata)
+            progress.chunks_split += len(chunks)
+            batch.extend(chunks)
+            while len(batch) >= self.batch_size:
+                await out_queue.put(batch[:self.batch_size])
+                batch = batch[self.batch_size:]
+        if batch:
+            await out_queue.put(batch)
+        await out_queue.put(_DONE)
+
+    async def _embed_stage(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue, progress: IngestionProgress):
+        while True:
+            batch = await in_queue.get()
+            if batch is _DONE:
+                break
+            # shared batcher: coalesces with chunks from other files being ingested concurrently
+            embeddings = await embedding_batcher.embed(batch)
+            progress.chunks_embedded += len(batch)
+            await out_queue.put((batch, embeddings))
+        await out_queue.put(_DONE)
+
+    async def _upsert_stage(self, in_queue: asyncio.Queue, progress: IngestionProgress) -> int:
+        upserted = 0
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                break
+            batch, embeddings = item
+            upserted += await ingest_executor.run(vector_store_service.upsert_embedded, batch, embeddings)
+            progress.chunks_upserted = upserted
+        # the batches above updated the knowledge graph in memory; persist it once per file
+        await ingest_executor.run(knowledge_graph_service.flush)
+        return upserted
+
+ingestion_pipeline = IngestionPipeline()
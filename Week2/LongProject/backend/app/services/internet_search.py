@@ -2,16 +2,29 @@ import requests
 from ddgs import DDGS 
 import arxiv
 from typing import List, Dict
+from ..config import settings
+from ..utils.executors import search_executor
+from ..utils.timings import timed
 
 class InternetSearchService:
     def __init__(self):
         pass
     
+    # The ddgs and arxiv clients block, so both searches run on search_executor;
+    # callers can then time them out without stalling the event loop.
     async def search_web(self, query: str, num_results: int = 5) -> List[Dict]:
+        with timed("web_search"):
+            return await search_executor.run(self._search_web, query, num_results)
+    
+    async def search_arxiv(self, query: str, max_results: int = 3) -> List[Dict]:
+        with timed("arxiv_search"):
+            return await search_executor.run(self._search_arxiv, query, max_results)
+    
+    def _search_web(self, query: str, num_results: int) -> List[Dict]:
         try:
             search_results = []
-            with DDGS() as ddgs:
-                results = ddgs.text(query, max_results=5)
+            with DDGS(timeout=int(settings.INTERNET_SEARCH_TIMEOUT)) as ddgs:
+                results = ddgs.text(query, max_results=num_results)
                 for r in results:
                     title = r.get("title")
                     url = r.get("href")
@@ -27,7 +40,7 @@ class InternetSearchService:
             print(f"Web search error: {e}")
             return []
     
-    async def search_arxiv(self, query: str, max_results: int = 3) -> List[Dict]:
+    def _search_arxiv(self, query: str, max_results: int) -> List[Dict]:
         try:
             client = arxiv.Client()
             search = arxiv.Search(
@@ -0,0 +1,275 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import networkx as nx
+from langchain.schema import Document
+from ..config import settings
+
+# Runs of capitalised words ("Retrieval Augmented Generation", "Pinecone") and acronyms ("RAG", "BM25")
+_CANDIDATE = re.compile(r"\b(?:[A-Z][\w\-]*[A-Za-z0-9])(?:\s+(?:of|de|van|von)?\s*[A-Z][\w\-]*[A-Za-z0-9])*\b")
+_STOP_STARTS = {
+    "The", "This", "That", "These", "Those", "There", "Then", "When", "Where", "What", "Which",
+    "While", "With", "Without", "However", "Also", "For", "From", "Figure", "Table", "Section",
+    "Page", "Chapter", "Note", "See", "In", "On", "At", "As", "An", "A", "It", "If", "We", "Our",
+    "They", "Their", "Its", "He", "She", "His", "Her", "You", "Your", "And", "But", "Or", "To",
+}
+
+def entity_key(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+class KnowledgeGraphService:
+    """
+    Corpus-wide knowledge graph, built incrementally at ingestion time.
+
+    Every upserted chunk contributes its entities: the chunk <-> entity edges live
+    in two dicts (chunk -> entity counts, and the inverted index entity -> chunks),
+    and entities found in the same chunk are linked in an nx.Graph whose edge
+    weight counts the chunks they co-occur in. Deleting a chunk takes all of that
+    back out. Only the chunk -> entities map is persisted, the index and the graph
+    are rebuilt from it on load: KG_PATH holds a snapshot (JSON written then
+    renamed) and KG_PATH.log the changes since, one JSON line per added or removed
+    batch. flush() appends the batches since the last flush to the log, so its cost
+    follows the size of the change, not of the corpus; once the log outgrows the
+    snapshot (and KG_COMPACT_MIN_BYTES) the snapshot is rewritten and the log emptied.
+
+    All access goes through one lock; queries only read and copy out small
+    results, so concurrent requests never see a half-updated graph. Serializing
+    and writing happen outside it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.KG_PATH
+        self.log_path = self.path + ".log"
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # one flush at a time; never taken while holding _lock
+        self._chunks: Dict[str, Dict] = {}  # chunk_id -> {"source": str, "entities": {key: count}}
+        self._index: Dict[str, Set[str]] = {}  # entity key -> chunk ids
+        self._labels: Dict[str, str] = {}  # entity key -> display form
+        self._heads: Dict[str, Counter] = {}  # first word of entity keys -> their word counts
+        self._graph = nx.Graph()
+        self._pending: List[Dict] = []  # change records not yet appended to the log
+        self._snapshot_bytes = 0
+        self._log_bytes = 0
+        self._load()
+
+    # ---------- Ingestion ----------
+    def extract_entities(self, text: str) -> Tuple[Dict[str, int], Dict[str, str]]:
+        """
+        (entity key -> mentions, entity key -> display form) for `text`, capped at
+        KG_MAX_ENTITIES_PER_CHUNK entities (most frequent first). Pure; takes no lock.
+        """
+        counts: Counter = Counter()
+        labels: Dict[str, str] = {}
+        for match in _CANDIDATE.finditer(text or ""):
+            words = match.group(0).split()
+            while words and words[0] in _STOP_STARTS:
+                words = words[1:]
+            name = " ".join(words)
+            if not name or (len(words) == 1 and len(name) < 4 and not name.isupper()):
+                continue
+            key = entity_key(name)
+            counts[key] += 1
+            labels.setdefault(key, name)
+        top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:settings.KG_MAX_ENTITIES_PER_CHUNK]
+        return dict(top), {key: labels[key] for key, _ in top}
+
+    def add_chunks(self, chunk_ids: List[str], documents: List[Document]):
+        """Index a batch of upserted chunks. Re-adding an id replaces its previous entry. Blocking."""
+        entries = [
+            (chunk_id, (doc.metadata or {}).get("source", "Unknown"), *self.extract_entities(doc.page_content))
+            for chunk_id, doc in zip(chunk_ids, documents)
+        ]
+        record = {"labels": {}, "chunks": {}}
+        for chunk_id, source, entities, labels in entries:
+            for key, label in labels.items():
+                record["labels"].setdefault(key, label)
+            record["chunks"][chunk_id] = {"source": source, "entities": entities}
+        with self._lock:
+            self._apply(record)
+            self._pending.append(record)
+
+    def remove_chunks(self, chunk_ids: Iterable[str]):
+        record = {"removed": list(chunk_ids)}
+        with self._lock:
+            self._apply(record)
+            self._pending.append(record)
+
+    def flush(self):
+        """Persist the changes made since the last flush. Blocking."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                compact = bool(pending) and self._log_bytes >= max(settings.KG_COMPACT_MIN_BYTES, self._snapshot_bytes)
+                if compact:
+                    # entries are replaced, never mutated, so shallow copies are a consistent snapshot
+                    labels, chunks = dict(self._labels), dict(self._chunks)
+            if not pending:
+                return
+            if compact:
+                self._write_snapshot(labels, chunks)
+            else:
+                lines = "".join(json.dumps(record) + "\n" for record in pending)
+                with open(self.log_path, 'a', encoding='utf-8') as file:
+                    file.write(lines)
+                self._log_bytes += len(lines.encode("utf-8"))
+
+    # ---------- Query time (read-only) ----------
+    def lookup(self, documents: List[Document], query: str) -> Tuple[List[str], List[Tuple[str, str, int]]]:
+        """
+        Entities of the retrieved chunks, ranked by how many of them mention the
+        entity (entities named in the query first), and the strongest
+        co-occurrence relations between them. Returns (entities, [(a, b, weight)]).
+        """
+        query_keys = self._query_entities(query)
+        with self._lock:
+            known = [self._chunks.get((doc.metadata or {}).get("chunk_id")) for doc in documents]
+        mentions: Counter = Counter()
+        extra_labels: Dict[str, str] = {}
+        for doc, entry in zip(documents, known):
+            if entry is None:
+                # chunk indexed before the graph existed: extract on the fly, don't store
+                entities, labels = self.extract_entities(doc.page_content)
+                extra_labels.update(labels)
+            else:
+                entities = entry["entities"]
+            mentions.update(entities.keys())
+
+        with self._lock:
+            # ties go to entities more of the corpus mentions; O(1) each, unlike a weighted degree
+            rank = lambda key: (key not in query_keys, -mentions[key], -len(self._index.get(key, ())), key)
+            ranked = sorted(set(mentions) | query_keys, key=rank)[:settings.KG_QUERY_ENTITIES]
+            relations = []
+            graph = self._graph
+            for index, key in enumerate(ranked):
+                # probe only the other chosen entities; well-connected entities have thousands of neighbours
+                neighbours = [(other, graph[key][other]["weight"]) for other in ranked[index + 1:] if graph.has_edge(key, other)]
+                if neighbours:
+                    neighbours.sort(key=lambda item: (-item[1], item[0]))
+                    relations.extend((key, other, weight) for other, weight in neighbours[:settings.KG_RELATIONS_PER_ENTITY])
+            relations.sort(key=lambda item: (-item[2], item[0], item[1]))
+            label = lambda key: self._labels.get(key) or extra_labels.get(key, key)
+            return [label(key) for key in ranked], [(label(a), label(b), weight) for a, b, weight in relations]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "chunks": len(self._chunks),
+                "entities": len(self._index),
+                "relations": self._graph.number_of_edges(),
+            }
+
+    # ---------- Internals ----------
+    def _write_snapshot(self, labels: Dict[str, str], chunks: Dict[str, Dict]):
+        """Replace the snapshot with `labels`/`chunks` (which include every logged change) and empty the log"""
+        payload = json.dumps({"version": 1, "labels": labels, "chunks": chunks})
+        # write-then-rename so a crash mid-write never leaves a truncated graph; a crash
+        # before the log is emptied only means replaying changes the snapshot already has
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(payload)
+        os.replace(tmp_path, self.path)
+        open(self.log_path, 'w').close()
+        self._snapshot_bytes = len(payload.encode("utf-8"))
+        self._log_bytes = 0
+
+    def _query_entities(self, query: str) -> Set[str]:
+        """Known entities named in the query; only word runs starting like some entity are tried"""
+        words = re.findall(r"[\w\-]+", (query or "").casefold())
+        found = set()
+        with self._lock:
+            for start, word in enumerate(words):
+                for length in self._heads.get(word, ()):
+                    gram = " ".join(words[start:start + length])
+                    if gram in self._index:
+                        found.add(gram)
+        return found
+
+    # the helpers below expect the lock to be held
+    def _apply(self, record: Dict):
+        # remove everything first: dropping a chunk's last mention of an entity drops its label too
+        added = record.get("chunks", {})
+        for chunk_id in [*record.get("removed", ()), *added]:
+            self._remove(chunk_id)
+        for key, label in record.get("labels", {}).items():
+            self._labels.setdefault(key, label)
+        for chunk_id, entry in added.items():
+            self._add(chunk_id, entry.get("source", "Unknown"), entry.get("entities", {}))
+
+    def _add(self, chunk_id: str, source: str, entities: Dict[str, int]):
+        self._chunks[chunk_id] = {"source": source, "entities": entities}
+        for key in entities:
+            if key not in self._index:
+                self._index[key] = set()
+                words = key.split(" ")
+                self._heads.setdefault(words[0], Counter())[len(words)] += 1
+            self._index[key].add(chunk_id)
+            self._graph.add_node(key)
+        for a, b in combinations(sorted(entities), 2):
+            if self._graph.has_edge(a, b):
+                self._graph[a][b]["weight"] += 1
+            else:
+                self._graph.add_edge(a, b, weight=1)
+
+    def _remove(self, chunk_id: str):
+        entry = self._chunks.pop(chunk_id, None)
+        if entry is None:
+            return
+        entities = entry["entities"]
+        for a, b in combinations(sorted(entities), 2):
+            if self._graph.has_edge(a, b):
+                self._graph[a][b]["weight"] -= 1
+                if self._graph[a][b]["weight"] <= 0:
+                    self._graph.remove_edge(a, b)
+        for key in entities:
+            chunks = self._index.get(key)
+            if chunks is None:
+                continue
+            chunks.discard(chunk_id)
+            if not chunks:
+                del self._index[key]
+                self._labels.pop(key, None)
+                words = key.split(" ")
+                lengths = self._heads[words[0]]
+                lengths[len(words)] -= 1
+                if lengths[len(words)] <= 0:
+                    del lengths[len(words)]
+                    if not lengths:
+                        del self._heads[words[0]]
+                if key in self._graph:
+                    self._graph.remove_node(key)
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                self._snapshot_bytes = os.path.getsize(self.path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not load knowledge graph from {self.path}, starting empty: {e}")
+                return
+            self._apply(data)
+        if os.path.exists(self.log_path):
+            good = 0
+            with open(self.log_path, 'rb') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        record = None
+                    if record is None:
+                        break  # torn last line from a crash mid-append
+                    self._apply(record)
+                    good += len(line)
+            if good < os.path.getsize(self.log_path):
+                # drop the torn tail so later appends start on a line of their own
+                with open(self.log_path, 'r+b') as file:
+                    file.truncate(good)
+            self._log_bytes = good
+        if self._chunks:
+            print(f"🕸️ Loaded knowledge graph: {len(self._chunks)} chunks, {len(self._index)} entities")
+
+knowledge_graph_service = KnowledgeGraphService()
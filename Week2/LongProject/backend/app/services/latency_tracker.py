@@ -0,0 +1,86 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Optional
+from ..config import settings
+
+# Log-spaced bucket upper bounds from 10 ms to ~2 min (25% apart)
+_BUCKETS: List[float] = []
+_bound = 0.01
+while _bound < 120:
+    _BUCKETS.append(round(_bound, 4))
+    _bound *= 1.25
+_BUCKETS.append(float("inf"))
+
+# Halve all counts once a histogram holds this many samples, so old latencies fade out
+_AGE_AT = 2000
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with exponential aging; quantiles are bucket upper bounds"""
+
+    def __init__(self):
+        self.counts = [0] * len(_BUCKETS)
+        self.total = 0
+        self.samples = 0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(_BUCKETS, seconds)] += 1
+        self.total += 1
+        self.samples += 1
+        if self.total >= _AGE_AT:
+            self.counts = [count // 2 for count in self.counts]
+            self.total = sum(self.counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for bound, count in zip(_BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return _BUCKETS[-1]
+
+class LatencyTracker:
+    """
+    Per-model time-to-first-token histograms. They drive the hedging delay: a
+    request whose primary model is slower than its recent p95 gets a second
+    attempt on the fallback model.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            self._histograms.setdefault(model, LatencyHistogram()).record(seconds)
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait for the primary model's first token before hedging"""
+        with self._lock:
+            histogram = self._histograms.get(model)
+            if histogram is None or histogram.samples < settings.LLM_HEDGE_MIN_SAMPLES:
+                return settings.LLM_HEDGE_DEFAULT_DELAY
+            p95 = histogram.quantile(0.95)
+        return min(max(p95, settings.LLM_HEDGE_MIN_DELAY), settings.LLM_HEDGE_MAX_DELAY)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "time_to_first_token": {
+                    model: {
+                        "samples": histogram.samples,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99),
+                    }
+                    for model, histogram in self._histograms.items()
+                },
+            }
+
+latency_tracker = LatencyTracker()
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import settings
+
+# Disk hits only bump accessed_at in memory; the recency updates are written in one
+# batch once this many are pending or the oldest is this old (or with the next set()).
+# Eviction order can lag by that much, which LRU over hours-long TTLs doesn't notice.
+TOUCH_BATCH = 64
+TOUCH_FLUSH_SECONDS = 5.0
+
+def _size(value: str) -> int:
+    """Bytes the value takes as UTF-8, which is what the budget and stats count"""
+    return len(value.encode("utf-8"))
+
+class CompletionCache:
+    """
+    Two-tier cache of LLM completions keyed by a hash of
+    (model, messages, temperature, max_tokens).
+
+    Tier 1 is an in-process LRU (bounded by entry count); tier 2 is a SQLite
+    file shared across restarts and workers (bounded by total bytes, evicting
+    least recently used rows). Both tiers honour the same TTL. Blocking: call the
+    get/set methods off the event loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_entries: Optional[int] = None,
+                 max_disk_bytes: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self.path = path or settings.LLM_CACHE_PATH
+        self.memory_entries = memory_entries or settings.LLM_CACHE_MEMORY_ENTRIES
+        self.max_disk_bytes = max_disk_bytes or settings.LLM_CACHE_MAX_DISK_BYTES
+        self.ttl = ttl_seconds or settings.LLM_CACHE_TTL_SECONDS
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        self._touched: Dict[str, float] = {}  # key -> accessed_at not yet written
+        self._touched_since = 0.0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.bytes_served += _size(entry[0])
+                return entry[0]
+            if entry:
+                self._drop_memory(key)
+
+            db = self._connect()
+            row = db.execute("SELECT value, expires_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                self._touch(key, now)
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                self.bytes_served += _size(row[0])
+                return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            db = self._connect()
+            self._touched.pop(key, None)
+            self._write_touches()
+            previous = db.execute(
+                "SELECT length(CAST(value AS BLOB)) FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._disk_bytes += _size(value) - (previous[0] if previous else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk(now)
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "enabled": settings.LLM_CACHE_ENABLED,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else None,
+                "bytes_served": self.bytes_served,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    # ---------- Internals (caller holds self._lock) ----------
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+            self._db.execute("DELETE FROM completions WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(length(CAST(value AS BLOB))), 0) FROM completions"
+            ).fetchone()[0]
+        return self._db
+
+    def _touch(self, key: str, now: float):
+        if not self._touched:
+            self._touched_since = now
+        self._touched[key] = now
+        if len(self._touched) >= TOUCH_BATCH or now - self._touched_since >= TOUCH_FLUSH_SECONDS:
+            self._write_touches()
+            self._db.commit()
+
+    def _write_touches(self):
+        """Queue the pending recency updates on the connection; the caller commits"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        if key in self._memory:
+            self._drop_memory(key)
+        self._memory[key] = (value, expires_at)
+        self._memory_bytes += _size(value)
+        while len(self._memory) > self.memory_entries:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+
+    def _drop_memory(self, key: str):
+        value, _ = self._memory.pop(key)
+        self._memory_bytes -= _size(value)
+
+    def _evict_disk(self, now: float):
+        db = self._db
+        db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+        self._disk_bytes = db.execute(
+            "SELECT COALESCE(SUM(length(CAST(value AS BLOB))), 0) FROM completions"
+        ).fetchone()[0]
+        # drop least recently used rows until back under 90% of the budget
+        target = int(self.max_disk_bytes * 0.9)
+        rows = db.execute("SELECT key, length(CAST(value AS BLOB)) FROM completions ORDER BY accessed_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        db.executemany("DELETE FROM completions WHERE key = ?", doomed)
+
+completion_cache = CompletionCache()
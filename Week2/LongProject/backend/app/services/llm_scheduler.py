@@ -0,0 +1,263 @@
+import asyncio
+import bisect
+import itertools
+import random
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import groq
+from ..config import settings
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # user-facing chat; always dispatched first
+    BULK = 1         # background work (summaries, ingestion-time calls)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+# HTTP statuses worth retrying besides 429
+_RETRYABLE_STATUS = {408, 409, 500, 502, 503, 504}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset headers such as '7.66s', '2m59.56s' or '120ms' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+def _int_header(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class ModelBudget:
+    """Last known rate-limit state of one model, from its x-ratelimit-* response headers"""
+
+    def __init__(self):
+        self.requests_remaining: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.tokens_remaining: Optional[int] = None
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+
+    def update(self, headers, now: float):
+        requests_remaining = _int_header(headers, "x-ratelimit-remaining-requests")
+        if requests_remaining is not None:
+            self.requests_remaining = requests_remaining
+            self.requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0)
+        tokens_remaining = _int_header(headers, "x-ratelimit-remaining-tokens")
+        if tokens_remaining is not None:
+            self.tokens_remaining = tokens_remaining
+            self.tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a call estimated at `tokens` fits the budget (0 = now)"""
+        waits = [self.blocked_until - now]
+        if self.requests_remaining is not None and self.requests_remaining <= 0:
+            waits.append(self.requests_reset_at - now)
+        if self.tokens_remaining is not None and self.tokens_remaining < tokens:
+            waits.append(self.tokens_reset_at - now)
+        return max(0.0, *waits)
+
+    def reserve(self, tokens: int, now: float):
+        # once a window has reset its budget is unknown again until the next headers arrive
+        if self.requests_remaining is not None:
+            self.requests_remaining = None if now >= self.requests_reset_at else self.requests_remaining - 1
+        if self.tokens_remaining is not None:
+            self.tokens_remaining = None if now >= self.tokens_reset_at else self.tokens_remaining - tokens
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "requests_remaining": self.requests_remaining,
+            "requests_reset_in": max(0.0, self.requests_reset_at - now),
+            "tokens_remaining": self.tokens_remaining,
+            "tokens_reset_in": max(0.0, self.tokens_reset_at - now),
+            "blocked_for": max(0.0, self.blocked_until - now),
+        }
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "model", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int, model: str, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class LLMScheduler:
+    """
+    Admission control for Groq calls. Callers wait in one queue ordered by
+    (priority, arrival); a call is dispatched when a concurrency slot is free
+    (GROQ_MAX_IN_FLIGHT) and its model's request/token budget - learned from the
+    x-ratelimit-* headers of earlier responses - has room for it. 429s and
+    transient failures are retried with full-jitter exponential backoff, honouring
+    retry-after; a 429 also pauses the whole model so queued calls don't repeat it.
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None, max_retries: Optional[int] = None):
+        self.max_in_flight = max_in_flight or settings.GROQ_MAX_IN_FLIGHT
+        self.max_retries = settings.GROQ_MAX_RETRIES if max_retries is None else max_retries
+        self.budgets: Dict[str, ModelBudget] = {}
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._waits = deque(maxlen=1000)
+        self.dispatched = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    @asynccontextmanager
+    async def request(self, model: str, call: Callable[[], Awaitable[Any]], tokens: int,
+                      priority: Priority = Priority.INTERACTIVE):
+        """
+        Run `call` (returning a raw response with .headers) once admitted, retrying
+        retryable failures. Yields the raw response; the slot stays held until the
+        block exits, so streamed responses count against the concurrency cap.
+        """
+        attempt = 0
+        while True:
+            await self._acquire(model, tokens, priority)
+            try:
+                raw = await call()
+            except Exception as e:
+                self._release()
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # cancelled mid-call (hedge loser, deadline, client disconnect): free the slot
+                self._release()
+                raise
+            try:
+                self.record_headers(model, raw.headers)
+                yield raw
+            finally:
+                self._release()
+            return
+
+    def record_headers(self, model: str, headers):
+        self.budgets.setdefault(model, ModelBudget()).update(headers, time.monotonic())
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        waits = sorted(self._waits)
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for waiter in self._waiting:
+            depth[Priority(waiter.priority).name.lower()] += 1
+        return {
+            "queue_depth": depth,
+            "in_flight": self._in_flight,
+            "dispatched": self.dispatched,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "wait_seconds": {
+                "mean": sum(waits) / len(waits) if waits else None,
+                "p95": waits[int(len(waits) * 0.95) - 1] if waits else None,
+                "max": waits[-1] if waits else None,
+            },
+            "models": {model: budget.snapshot(now) for model, budget in self.budgets.items()},
+        }
+
+    # ---------- Internals ----------
+    async def _acquire(self, model: str, tokens: int, priority: Priority):
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(int(priority), next(self._seq), model, tokens, future)
+        bisect.insort(self._waiting, waiter)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # granted just as we were cancelled: hand the slot back
+                self._release()
+            elif waiter in self._waiting:
+                self._waiting.remove(waiter)
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        next_check = None
+        blocked_models = set()
+        for waiter in list(self._waiting):
+            if self._in_flight >= self.max_in_flight:
+                break
+            if waiter.future.done():
+                self._waiting.remove(waiter)
+                continue
+            if waiter.model in blocked_models:
+                # don't let smaller, lower-priority calls overtake a waiting call on the same model
+                continue
+            budget = self.budgets.setdefault(waiter.model, ModelBudget())
+            wait = budget.wait_time(waiter.tokens, now)
+            if wait > 0:
+                blocked_models.add(waiter.model)
+                next_check = wait if next_check is None else min(next_check, wait)
+                continue
+            budget.reserve(waiter.tokens, now)
+            self._waiting.remove(waiter)
+            self._in_flight += 1
+            self.dispatched += 1
+            self._waits.append(now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+        if next_check is not None:
+            self._schedule(next_check)
+
+    def _schedule(self, delay: float):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        when = now + delay
+        pending = self._timer is not None and not self._timer.cancelled() and self._timer.when() > now
+        if pending and self._timer.when() <= when:
+            return
+        if pending:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._dispatch)
+
+    def _retry_delay(self, model: str, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to back off before retrying, or None if `error` should propagate"""
+        if attempt >= self.max_retries:
+            return None
+        retry_after = None
+        if isinstance(error, groq.APIStatusError):
+            headers = error.response.headers
+            self.budgets.setdefault(model, ModelBudget()).update(headers, time.monotonic())
+            if error.status_code != 429 and error.status_code not in _RETRYABLE_STATUS:
+                return None
+            retry_after = parse_duration(headers.get("retry-after"))
+        elif not isinstance(error, groq.APIConnectionError):
+            return None
+
+        backoff = random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * 2 ** attempt))
+        delay = max(backoff, retry_after or 0.0)
+        if isinstance(error, groq.RateLimitError):
+            self.rate_limited += 1
+            budget = self.budgets[model]
+            budget.blocked_until = max(budget.blocked_until, time.monotonic() + delay)
+        return delay
+
+llm_scheduler = LLMScheduler()
@@ -1,44 +1,244 @@
+import asyncio
 import groq
+import httpx
 import google.generativeai as genai
 from ..config import settings
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 import time
+from .llm_cache import completion_cache
+from .llm_scheduler import llm_scheduler, Priority
+from .latency_tracker import latency_tracker
+from ..utils.executors import query_executor
+from ..utils.deadline import within_deadline, DeadlineExceeded
+from ..utils.timings import timed, record_stage, current_timings
+
+# Generation parameters for RAG answers (also part of the completion cache key)
+TEMPERATURE = 0.1
+MAX_TOKENS = 1024
+
+# Marks the end of a completion in the per-attempt delta queues
+_END = object()
 
 class LLMService:
     def __init__(self):
-        self.groq_client = groq.Client(api_key=settings.GROQ_API_KEY)
+        # One keep-alive connection pool shared by every request on this worker
+        timeout = httpx.Timeout(settings.GROQ_TIMEOUT, connect=settings.GROQ_CONNECT_TIMEOUT)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_CONNECTIONS
+            ),
+            timeout=timeout
+        )
+        self.groq_client = groq.AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL or None,
+            http_client=self.http_client,
+            # the SDK sends its own timeout with every request; a plain float would drop the connect timeout
+            timeout=timeout,
+            # retries, backoff and concurrency are owned by llm_scheduler
+            max_retries=0
+        )
         genai.configure(api_key=settings.GOOGLE_API_KEY)
+    
+    async def aclose(self):
+        await self.http_client.aclose()
         
-    async def generate_response_groq(self, prompt: str, model: str, conversation_history: List) -> str:
+    async def generate_response_groq(self, prompt: str, model: str, conversation_history: List,
+                                     use_cache: bool = True, priority: Priority = Priority.INTERACTIVE) -> str:
         try:
-            # Format conversation history
-            messages = []
-            for msg in conversation_history[-10:]:  # Last 10 messages
-                if isinstance(msg, dict):
-                    text = msg.get("message", "")
-                    is_user = msg.get("is_user", "assistant")
-                else:
-                    # object-like (Pydantic model or custom)
-                    # use getattr fallback to support both styles
-                    is_user = getattr(msg, "is_user", "assistant")
-                    text = getattr(msg, "message", None)
-                    
-                role = is_user
-                messages.append({"role": role, "content": text})
-            
-            messages.append({"role": "user", "content": prompt})
-            
-            response = self.groq_client.chat.completions.create(
-                model=settings.GROQ_MODELS[model],
-                messages=messages,
-                temperature=0.1,
-                max_tokens=1024
-            )
-            
-            return response.choices[0].message.content
+            return await self.complete(prompt, model, conversation_history, use_cache, priority)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
+    async def complete(self, prompt: str, model: str, conversation_history: List,
+                       use_cache: bool = True, priority: Priority = Priority.INTERACTIVE) -> str:
+        """Same as generate_response_groq, but failures raise instead of becoming the answer text"""
+        messages = self._build_messages(prompt, conversation_history)
+        
+        cache_key = self._cache_key(model, messages) if use_cache else None
+        if cache_key:
+            with timed("llm_cache"):
+                cached = await query_executor.run(completion_cache.get, cache_key)
+            if cached is not None:
+                return cached
+        
+        # streamed internally so time-to-first-token is measured and hedging can act on it
+        served = {}
+        with timed("llm_generation"):
+            content = await within_deadline(
+                "generation", self._collect(self._completion_stream(model, messages, priority, served)), optional=False
+            )
+        if cache_key and content:
+            # a hedged answer may come from the fallback model: cache it under that model's key
+            await query_executor.run(completion_cache.set, self._cache_key(served["model"], messages), content)
+        return content
+    
+    async def stream_response_groq(self, prompt: str, model: str, conversation_history: List,
+                                   use_cache: bool = True,
+                                   priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[str]:
+        """
+        Yield completion text deltas as Groq streams them. A cache hit is yielded as a
+        single delta; a fully streamed answer is cached. Errors propagate to the caller.
+        """
+        messages = self._build_messages(prompt, conversation_history)
+        
+        cache_key = self._cache_key(model, messages) if use_cache else None
+        if cache_key:
+            with timed("llm_cache"):
+                cached = await query_executor.run(completion_cache.get, cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        parts = []
+        served = {}
+        # resolved now: an abandoned stream may be closed later from another context
+        timings = current_timings()
+        start_time = time.perf_counter()
+        try:
+            async for delta in self._completion_stream(model, messages, priority, served):
+                parts.append(delta)
+                yield delta
+        finally:
+            if timings is not None:
+                timings.record("llm_generation", time.perf_counter() - start_time)
+        
+        if cache_key and parts:
+            await query_executor.run(completion_cache.set, self._cache_key(served["model"], messages), "".join(parts))
+    
+    async def _completion_stream(self, model: str, messages: List[dict], priority: Priority,
+                                 served: Optional[dict] = None) -> AsyncIterator[str]:
+        """
+        Completion deltas for `messages`. With LLM_HEDGING_ENABLED, if `model` has not
+        produced a first token within its p95-derived hedge delay (or fails before
+        one), the same prompt is also sent to its LLM_FALLBACK_MODELS entry. Whichever
+        produces a first token first is streamed; the other attempt is cancelled.
+        The model actually streamed is stored in served["model"].
+        """
+        fallback = settings.LLM_FALLBACK_MODELS.get(model) if settings.LLM_HEDGING_ENABLED else None
+        if fallback == model or fallback not in settings.GROQ_MODELS:
+            fallback = None
+        
+        # each attempt streams into its own queue from its own task, so the loser
+        # can be cancelled without touching the winner's connection
+        attempts = []
+        getters = {}
+        
+        def launch(name: str):
+            queue = asyncio.Queue()
+            attempts.append((queue, asyncio.create_task(self._pump_stream(name, messages, priority, queue))))
+            getters[asyncio.ensure_future(queue.get())] = len(attempts) - 1
+        
+        launch(model)
+        timeout = latency_tracker.hedge_delay(model) if fallback else None
+        winner = first = error = None
+        try:
+            while getters and winner is None:
+                done, _ = await asyncio.wait(getters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # primary is slower than its recent p95: hedge
+                    timeout = None
+                    latency_tracker.hedges += 1
+                    launch(fallback)
+                    continue
+                for getter in done:
+                    index = getters.pop(getter)
+                    item = getter.result()
+                    if isinstance(item, Exception):
+                        error = error or item
+                        if fallback and len(attempts) == 1:
+                            # primary failed before its first token: fall back right away
+                            timeout = None
+                            launch(fallback)
+                    else:
+                        winner, first = index, item
+                        break
+        finally:
+            for getter in getters:
+                getter.cancel()
+            for index, (_, pump) in enumerate(attempts):
+                if index != winner:
+                    pump.cancel()
+        
+        if winner is None:
+            raise error
+        if winner > 0:
+            latency_tracker.hedge_wins += 1
+        if served is not None:
+            served["model"] = fallback if winner > 0 else model
+        queue, pump = attempts[winner]
+        try:
+            item = first
+            while item is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                item = await queue.get()
+        finally:
+            pump.cancel()
+    
+    async def _collect(self, deltas: AsyncIterator[str]) -> str:
+        return "".join([delta async for delta in deltas])
+    
+    async def _pump_stream(self, model: str, messages: List[dict], priority: Priority, queue: asyncio.Queue):
+        """Stream one model's completion into `queue`: deltas, then _END or the exception"""
+        start_time = time.time()
+        first_token = True
+        call = lambda: self.groq_client.chat.completions.with_raw_response.create(
+            model=settings.GROQ_MODELS[model],
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            stream=True
+        )
+        try:
+            async with llm_scheduler.request(model, call, self._estimate_tokens(messages), priority) as raw:
+                stream = await raw.parse()
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if first_token:
+                            latency_tracker.record(model, time.time() - start_time)
+                            # includes scheduler queueing and retries
+                            record_stage("llm_first_token", time.time() - start_time)
+                            first_token = False
+                        queue.put_nowait(delta)
+            queue.put_nowait(_END)
+        except Exception as e:
+            queue.put_nowait(e)
+    
+    def _cache_key(self, model: str, messages: List[dict]) -> Optional[str]:
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        return completion_cache.make_key(settings.GROQ_MODELS[model], messages, TEMPERATURE, MAX_TOKENS)
+    
+    def _estimate_tokens(self, messages: List[dict]) -> int:
+        # rough prompt size (~4 chars per token) plus the completion allowance, for budget checks
+        chars = sum(len(str(message.get("content") or "")) for message in messages)
+        return chars // 4 + MAX_TOKENS
+    
+    def _build_messages(self, prompt: str, conversation_history: List) -> List[dict]:
+        # Format conversation history
+        messages = []
+        for msg in conversation_history[-10:]:  # Last 10 messages
+            if isinstance(msg, dict):
+                text = msg.get("message", "")
+                is_user = msg.get("is_user", False)
+            else:
+                # object-like (Pydantic model or custom)
+                # use getattr fallback to support both styles
+                is_user = getattr(msg, "is_user", False)
+                text = getattr(msg, "message", None)
+                
+            role = "user" if is_user else "assistant"
+            messages.append({"role": role, "content": text or ""})
+        
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
     async def generate_response_gemini(self, prompt: str, conversation_history: List) -> str:
         try:
             model = genai.GenerativeModel('gemma-3-27b-it')
@@ -0,0 +1,26 @@
+"""
+Functions executed in the OCR worker processes.
+
+Workers are spawned, so each one imports the module a submitted function lives
+in. Keep this module light: PIL, pytesseract and pdf2image only, nothing from
+the app (settings, models, vector store).
+"""
+from PIL import Image, ImageOps
+import pytesseract
+
+def ocr_image(file_path: str, max_side: int, binarize: bool) -> str:
+    """Optional downscale/binarize, then tesseract."""
+    image = Image.open(file_path)
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if binarize:
+        image = ImageOps.autocontrast(image.convert("L"))
+        image = image.point(lambda px: 255 if px > 128 else 0, mode="1")
+    return pytesseract.image_to_string(image)
+
+def ocr_pdf_page(file_path: str, page_number: int, dpi: int = 300) -> str:
+    """Rasterize a single 1-based page with pdf2image and OCR it."""
+    # imported lazily: only scanned pages need pdf2image/poppler
+    import pdf2image
+    images = pdf2image.convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    return "\n".join(pytesseract.image_to_string(image) for image in images)
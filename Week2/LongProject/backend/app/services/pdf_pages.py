@@ -0,0 +1,50 @@
+from typing import Callable, Iterator, Tuple
+import PyPDF2
+from .ocr_worker import ocr_pdf_page
+
+# Page text extracted either from the embedded text layer or by OCR
+TEXT_LAYER = "text"
+OCR = "ocr"
+
+def text_layer_is_usable(text: str, min_chars: int = 32) -> bool:
+    """
+    Decide whether a page's embedded text layer is good enough to skip OCR.
+    Scanned pages have no (or almost no) text; broken font encodings show up as
+    unprintable characters, U+FFFD, "(cid:NN)" escapes or runs without letters.
+    """
+    stripped = (text or "").strip()
+    if len(stripped) < min_chars:
+        return False
+    printable = sum(1 for ch in stripped if ch.isprintable() or ch.isspace())
+    if printable / len(stripped) < 0.95:
+        return False
+    if (stripped.count("\ufffd") + 5 * stripped.count("(cid:")) / len(stripped) > 0.02:
+        return False
+    words = stripped.split()
+    wordlike = sum(1 for word in words if any(ch.isalpha() for ch in word))
+    return wordlike / len(words) >= 0.5
+
+def iter_pdf_pages(file_path: str, ocr_page: Callable[[str, int], str] = ocr_pdf_page,
+                   window: int = 200, min_chars: int = 32) -> Iterator[Tuple[int, str, str]]:
+    """
+    Yields (page_number, text, method) for every page: the embedded text layer when
+    it passes text_layer_is_usable, otherwise `ocr_page(file_path, page_number)`.
+    Digitally generated PDFs therefore never touch the rasterizer. The reader is
+    reopened every `window` pages so its object cache does not grow with page count.
+    """
+    window = max(1, window)
+    page_index = 0
+    page_count = None
+    while page_count is None or page_index < page_count:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            stop = min(page_index + window, page_count)
+            while page_index < stop:
+                text = pdf_reader.pages[page_index].extract_text() or ""
+                if text_layer_is_usable(text, min_chars):
+                    yield page_index + 1, text, TEXT_LAYER
+                else:
+                    yield page_index + 1, ocr_page(file_path, page_index + 1), OCR
+                page_index += 1
+            del pdf_reader
@@ -1,30 +1,99 @@
+import asyncio
+import hashlib
+import json
+from contextlib import nullcontext
 from typing import List, Tuple, Dict, Optional
 from .vector_store import vector_store_service
 from .internet_search import internet_search_service
 from .llm_service import llm_service
-import networkx as nx
+from .context_packer import context_packer
+from .history_manager import history_manager
+from .knowledge_graph import knowledge_graph_service
+from ..utils.executors import query_executor
+from ..config import settings
+from ..utils.deadline import Deadline, within_deadline, current_deadline
+from ..utils.simhash import simhash, from_hex, NearDuplicateFilter
+from ..utils.timings import timed
 from langchain.schema import Document
 
 class RAGService:
     def __init__(self):
-        self.knowledge_graph = nx.Graph()
+        # single-flight: identical concurrent requests share one in-flight computation
+        self._in_flight: Dict[str, Tuple[asyncio.Task, Optional[Deadline]]] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.leader_requests = 0
+        self.coalesced_requests = 0
+        self.near_duplicates_dropped = 0
 
     # ---------- Public RAG entry points ----------
-    async def vanilla_rag( self, query: str, conversation_history: List, llm_choice: str, use_internet: bool = False) -> Tuple[str, List[str]]:
+    async def answer(
+        self,
+        rag_variant: str,
+        query: str,
+        conversation_history: List,
+        llm_choice: str,
+        use_internet: bool = False,
+        use_cache: bool = True,
+    ) -> Tuple[str, List[str], Dict[str, int], List[str]]:
+        """
+        Dispatch to the requested RAG variant with request coalescing: while one
+        request is computing an answer, any other request with the same normalized
+        (query, llm_choice, rag_variant, use_internet, use_cache, history) awaits that
+        same computation instead of repeating retrieval and the LLM call. The
+        computation runs under the first request's deadline, so a request only joins
+        it if that deadline ends no more than COALESCE_DEADLINE_SLACK_SECONDS before
+        its own; otherwise it starts a fresh computation that later requests join.
+        A computation is cancelled once every request waiting on it has been cancelled.
+        Returns (response, sources, context_tokens, dropped_stages).
+        """
+        preparers = self._preparers()
+        if rag_variant not in preparers:
+            raise ValueError(f"Invalid RAG variant: {rag_variant}")
+
+        key = self._coalescing_key(rag_variant, query, conversation_history, llm_choice, use_internet, use_cache)
+        deadline = current_deadline()
+        task, leader_deadline = self._in_flight.get(key, (None, None))
+        if task is not None and not self._deadline_covers(leader_deadline, deadline):
+            task = None
+        # a coalesced request's stages are timed on the leader's request; it only waits
+        waiting = timed("coalesced_wait") if task is not None else nullcontext()
+        if task is not None:
+            self.coalesced_requests += 1
+        else:
+            self.leader_requests += 1
+            task = asyncio.create_task(
+                self._generate(preparers[rag_variant], query, conversation_history, llm_choice, use_internet, use_cache)
+            )
+            self._in_flight[key] = (task, deadline)
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # shield: one caller disconnecting must not cancel the answer the others are waiting for
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            with waiting:
+                return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def coalescing_stats(self) -> Dict[str, int]:
+        return {
+            "leader_requests": self.leader_requests,
+            "coalesced_requests": self.coalesced_requests,
+            "in_flight": len(self._in_flight),
+        }
+
+    async def vanilla_rag( self, query: str, conversation_history: List, llm_choice: str, use_internet: bool = False, use_cache: bool = True) -> Tuple[str, List[str]]:
         """
         Simple semantic-only retrieval + optional internet context.
         """
-        semantic_docs = await self._get_semantic_docs(query, k=4)
-        internet_results = await self._get_internet_results(query, use_internet, web_k=3)
-
-        context = self._build_context(
-            mode="vanilla", documents=semantic_docs, internet_results=internet_results
+        response, sources, _, _ = await self._generate(
+            self._prepare_vanilla, query, conversation_history, llm_choice, use_internet, use_cache
         )
-
-        prompt = self._compose_prompt(context, conversation_history, query, style="comprehensive")
-        response = await llm_service.generate_response_groq(prompt, llm_choice, conversation_history)
-        sources = self._extract_sources(semantic_docs)
-
         return response, sources
 
     async def knowledge_graph_rag(
@@ -33,25 +102,15 @@ class RAGService:
         conversation_history: List,
         llm_choice: str,
         use_internet: bool = False,
+        use_cache: bool = True,
     ) -> Tuple[str, List[str]]:
         """
-        Builds a simple KG from retrieved docs, extracts key entities and uses KG context.
+        Semantic retrieval plus the entities and co-occurrence relations the
+        ingestion-time knowledge graph holds for the retrieved chunks.
         """
-        docs = await self._get_semantic_docs(query, k=5)
-        # Build KG from docs
-        self._build_knowledge_graph(docs, query)
-
-        entities = self._extract_key_entities(docs, query)
-        kg_context = self._build_knowledge_graph_context(docs, entities)
-
-        internet_results = await self._get_internet_results(query, use_internet, web_k=3)
-        if internet_results:
-            kg_context += self._format_internet_results(internet_results)
-
-        prompt = self._compose_prompt(kg_context, conversation_history, query, style="kg_reasoning")
-        response = await llm_service.generate_response_groq(prompt, llm_choice, conversation_history)
-        sources = self._extract_sources(docs)
-
+        response, sources, _, _ = await self._generate(
+            self._prepare_knowledge_graph, query, conversation_history, llm_choice, use_internet, use_cache
+        )
         return response, sources
 
     async def hybrid_rag(
@@ -60,68 +119,236 @@ class RAGService:
         conversation_history: List,
         llm_choice: str,
         use_internet: bool = False,
+        use_cache: bool = True,
     ) -> Tuple[str, List[str]]:
         """
         Combines semantic and hybrid (semantic+BM25) retrieval and optional web/arXiv results.
         """
-        semantic_docs = await self._get_semantic_docs(query, k=3)
-        hybrid_docs = await vector_store_service.hybrid_search(query, k=3)
+        response, sources, _, _ = await self._generate(
+            self._prepare_hybrid, query, conversation_history, llm_choice, use_internet, use_cache
+        )
+        return response, sources
+
+    async def prepare(
+        self,
+        rag_variant: str,
+        query: str,
+        conversation_history: List,
+        llm_choice: str,
+        use_internet: bool = False,
+    ) -> Tuple[str, List[str], Dict[str, int]]:
+        """
+        Run retrieval for `rag_variant` and return (prompt, sources, context_tokens) without
+        calling the LLM, so callers such as the streaming endpoint can drive generation themselves.
+        """
+        preparers = self._preparers()
+        if rag_variant not in preparers:
+            raise ValueError(f"Invalid RAG variant: {rag_variant}")
+        return await preparers[rag_variant](query, conversation_history, llm_choice, use_internet)
+
+    # ---------- Retrieval + prompt building per variant ----------
+    # Each preparer fetches its independent sources concurrently (each helper applies its
+    # own timeout and returns [] on failure, so one slow or broken source only costs its
+    # own results), packs the context into llm_choice's token budget (see ContextPacker)
+    # and returns (prompt, sources of the packed documents, tokens used per section).
+    async def _prepare_vanilla(self, query: str, conversation_history: List, llm_choice: str,
+                               use_internet: bool) -> Tuple[str, List[str], Dict[str, int]]:
+        with timed("retrieval"):
+            semantic_docs, internet_results, history_text = await asyncio.gather(
+                self._get_semantic_docs(query, k=4),
+                self._get_internet_results(query, use_internet, web_k=3),
+                self._get_history(conversation_history, llm_choice),
+            )
+
+        semantic_docs = self._merge_unique_docs(semantic_docs)
+        semantic_docs, internet_results, context_tokens = await self._pack(
+            llm_choice, semantic_docs, internet_results, history_text, query, "comprehensive"
+        )
+        context = self._build_context(
+            mode="vanilla", documents=semantic_docs, internet_results=internet_results
+        )
+
+        prompt = self._compose_prompt(context, history_text, query, style="comprehensive")
+        return prompt, self._extract_sources(semantic_docs), context_tokens
+
+    async def _prepare_knowledge_graph(self, query: str, conversation_history: List, llm_choice: str,
+                                       use_internet: bool) -> Tuple[str, List[str], Dict[str, int]]:
+        with timed("retrieval"):
+            docs, internet_results, history_text = await asyncio.gather(
+                self._get_semantic_docs(query, k=5),
+                self._get_internet_results(query, use_internet, web_k=3),
+                self._get_history(conversation_history, llm_choice),
+            )
+        docs = self._merge_unique_docs(docs)
+        # read-only lookup in the graph built at ingestion time
+        with timed("kg_lookup"):
+            entities, relations = await query_executor.run(knowledge_graph_service.lookup, docs, query)
+        graph_text = self._format_graph(entities, relations)
+
+        docs, internet_results, context_tokens = await self._pack(
+            llm_choice, docs, internet_results, history_text, query, "kg_reasoning",
+            entities=graph_text
+        )
+        kg_context = self._build_knowledge_graph_context(docs, graph_text)
+        if internet_results:
+            kg_context += self._format_internet_results(internet_results)
+
+        prompt = self._compose_prompt(kg_context, history_text, query, style="kg_reasoning")
+        return prompt, self._extract_sources(docs), context_tokens
+
+    async def _prepare_hybrid(self, query: str, conversation_history: List, llm_choice: str,
+                              use_internet: bool) -> Tuple[str, List[str], Dict[str, int]]:
+        with timed("retrieval"):
+            semantic_docs, hybrid_docs, internet_results, history_text = await asyncio.gather(
+                self._get_semantic_docs(query, k=3),
+                self._get_hybrid_docs(query, k=3),
+                self._get_internet_results(query, use_internet, web_k=3, arxiv_k=2),
+                self._get_history(conversation_history, llm_choice),
+            )
 
         # Merge and deduplicate documents preserving order: semantic first, then hybrid
         merged_docs = self._merge_unique_docs(semantic_docs, hybrid_docs)
 
-        internet_results = await self._get_internet_results(query, use_internet, web_k=3, arxiv_k=2)
-
+        merged_docs, internet_results, context_tokens = await self._pack(
+            llm_choice, merged_docs, internet_results, history_text, query, "synthesise"
+        )
         context = self._build_context(mode="hybrid", documents=merged_docs, internet_results=internet_results)
-        prompt = self._compose_prompt(context, conversation_history, query, style="synthesise")
-        response = await llm_service.generate_response_groq(prompt, llm_choice, conversation_history)
-        sources = self._extract_sources(merged_docs)
-
-        return response, sources
+        prompt = self._compose_prompt(context, history_text, query, style="synthesise")
+        return prompt, self._extract_sources(merged_docs), context_tokens
 
     # ---------- Internal helpers (DRY) ----------
+    def _preparers(self) -> Dict:
+        return {
+            "vanilla": self._prepare_vanilla,
+            "knowledge_graph": self._prepare_knowledge_graph,
+            "hybrid": self._prepare_hybrid,
+        }
+
+    async def _generate(self, preparer, query: str, conversation_history: List, llm_choice: str,
+                        use_internet: bool, use_cache: bool) -> Tuple[str, List[str], Dict[str, int], List[str]]:
+        prompt, sources, context_tokens = await preparer(query, conversation_history, llm_choice, use_internet)
+        # history is already in the prompt (compacted); don't send it a second time as chat messages
+        response = await llm_service.generate_response_groq(prompt, llm_choice, [], use_cache)
+        deadline = current_deadline()
+        return response, sources, context_tokens, list(deadline.dropped) if deadline else []
+
+    async def _pack(self, llm_choice: str, documents: List[Document], internet_results: List[Dict],
+                    history_text: str, query: str, style: str,
+                    entities: Optional[str] = None) -> Tuple[List[Document], List[Dict], Dict[str, int]]:
+        """Fit documents and web results into llm_choice's budget after the fixed prompt parts"""
+        reserved = {
+            "history": history_text,
+            "question": f"{query}\n\n{self._style_instruction(style)}",
+        }
+        if entities:
+            reserved["entities"] = entities
+        # tokenization is CPU-bound; keep it off the event loop
+        with timed("context_packing"):
+            return await query_executor.run(context_packer.pack, llm_choice, documents, internet_results, reserved)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        # a later computation may have replaced this one under the same key
+        if self._in_flight.get(key, (None, None))[0] is task:
+            del self._in_flight[key]
+
+    @staticmethod
+    def _deadline_covers(leader: Optional[Deadline], follower: Optional[Deadline]) -> bool:
+        """Whether a computation running under `leader` may answer a request bound by `follower`"""
+        if leader is None:
+            return True
+        if follower is None:
+            return False
+        return leader.expires_at >= follower.expires_at - settings.COALESCE_DEADLINE_SLACK_SECONDS
+
+    def _coalescing_key(self, rag_variant: str, query: str, conversation_history: List,
+                        llm_choice: str, use_internet: bool, use_cache: bool) -> str:
+        normalized_query = " ".join((query or "").casefold().split())
+        history = [
+            (msg.get("is_user"), msg.get("message")) if isinstance(msg, dict)
+            else (getattr(msg, "is_user", None), getattr(msg, "message", None))
+            for msg in conversation_history or []
+        ]
+        history_hash = hashlib.sha256(json.dumps(history, default=str).encode("utf-8")).hexdigest()
+        return "|".join([rag_variant, llm_choice, str(bool(use_internet)), str(bool(use_cache)), history_hash, normalized_query])
+
     async def _get_semantic_docs(self, query: str, k: int = 4) -> List[Document]:
         try:
-            return await vector_store_service.similarity_search(query, k=k)
+            return await within_deadline(
+                "semantic_search", vector_store_service.similarity_search(query, k=k),
+                cap=settings.RETRIEVAL_TIMEOUT, default=[], reserve=settings.DEADLINE_GENERATION_RESERVE
+            )
         except Exception:
             # graceful fallback: return empty list on error
             return []
 
+    async def _get_hybrid_docs(self, query: str, k: int = 3) -> List[Document]:
+        try:
+            return await within_deadline(
+                "hybrid_search", vector_store_service.hybrid_search(query, k=k),
+                cap=settings.RETRIEVAL_TIMEOUT, default=[], reserve=settings.DEADLINE_GENERATION_RESERVE
+            )
+        except Exception:
+            return []
+
+    async def _get_history(self, conversation_history: List, llm_choice: str) -> str:
+        try:
+            return await history_manager.render(conversation_history, llm_choice)
+        except Exception as e:
+            # the answer can still be grounded in the retrieved context
+            print(f"History rendering failed, answering without it: {e}")
+            return ""
+
     async def _get_internet_results(
         self, query: str, use_internet: bool, web_k: int = 3, arxiv_k: int = 0
     ) -> List[Dict]:
         if not use_internet:
             return []
 
-        results: List[Dict] = []
-        try:
-            web_results = await internet_search_service.search_web(query, web_k)
-            results.extend(web_results or [])
-        except Exception:
-            # ignore web fetch errors but continue
-            pass
-
+        searches = [within_deadline(
+            "web_search", internet_search_service.search_web(query, web_k),
+            cap=settings.INTERNET_SEARCH_TIMEOUT, default=[], reserve=settings.DEADLINE_GENERATION_RESERVE
+        )]
         if arxiv_k > 0:
-            try:
-                arxiv_results = await internet_search_service.search_arxiv(query, arxiv_k)
-                if arxiv_results:
-                    results.extend(arxiv_results)
-            except Exception:
-                pass
+            searches.append(within_deadline(
+                "arxiv_search", internet_search_service.search_arxiv(query, arxiv_k),
+                cap=settings.INTERNET_SEARCH_TIMEOUT, default=[], reserve=settings.DEADLINE_GENERATION_RESERVE
+            ))
 
+        # web and arXiv run side by side; a failed search just contributes nothing
+        results: List[Dict] = []
+        for found in await asyncio.gather(*searches, return_exceptions=True):
+            if isinstance(found, BaseException):
+                if isinstance(found, asyncio.CancelledError):
+                    raise found
+                continue
+            results.extend(found or [])
         return results
 
     def _merge_unique_docs(self, *doc_lists: List[Document]) -> List[Document]:
-        """Merge multiple lists of Document while preserving order and de-duplicating by (content, source)."""
+        """
+        Merge lists of Document preserving order, dropping exact duplicates (content, source)
+        and near-duplicates: chunks whose SimHash is within NEAR_DUPLICATE_MAX_BITS of an
+        earlier one, e.g. the same passage from a re-uploaded revision of a file. Signatures
+        come from the "simhash" metadata stamped at ingestion (computed here for older chunks).
+        """
         seen = set()
+        near = NearDuplicateFilter(settings.NEAR_DUPLICATE_MAX_BITS) if settings.NEAR_DUPLICATE_FILTER else None
         merged: List[Document] = []
         for docs in doc_lists:
             for d in docs or []:
                 source = (d.metadata or {}).get("source", "")
                 key = (d.page_content.strip(), source)
-                if key not in seen:
-                    seen.add(key)
-                    merged.append(d)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if near is not None:
+                    signature = from_hex((d.metadata or {}).get("simhash"))
+                    if signature is None:
+                        signature = simhash(d.page_content)
+                    if not near.add(signature):
+                        self.near_duplicates_dropped += 1
+                        continue
+                merged.append(d)
         return merged
 
     def _extract_sources(self, docs: List[Document]) -> List[str]:
@@ -156,17 +383,11 @@ class RAGService:
 
         return "\n".join(ctx_lines)
 
-    def _compose_prompt(self, context: str, conversation_history: List, query: str, style: str = "comprehensive") -> str:
+    def _compose_prompt(self, context: str, history_text: str, query: str, style: str = "comprehensive") -> str:
         """
         Compose the final prompt sent to the LLM. 'style' controls slight instruction wording.
         """
-        style_instruction = {
-            "comprehensive": "Please provide a comprehensive answer citing given sources only. If the query is unrelated to the context, politely indicate that you don't have the information.",
-            "kg_reasoning": "Using knowledge graph reasoning, analyze relationships and provide an insightful answer citing sources. If the query is unrelated to the context, politely indicate that you don't have the information.",
-            "synthesise": "Synthesize information from all available sources and highlight key insights with citations. If the query is unrelated to the context, politely indicate that you don't have the information.",
-        }.get(style, "Please answer the user's question using the provided context and cite sources.")
-
-        history_text = self._format_history(conversation_history)
+        style_instruction = self._style_instruction(style)
 
         prompt = (
             f"Context:\n{context}\n\n"
@@ -176,59 +397,27 @@ class RAGService:
         )
         return prompt
 
-    def _format_history(self, conversation_history: List) -> str:
-        """
-        Formats the last few messages in conversation_history. Handles simple objects/dicts.
-        Expects elements that either have attributes `.is_user` and `.message` or are dict-like:
-        {'is_user': True|False, 'message': '...'}
-        """
-        if not conversation_history:
-            return "(no prior messages)"
+    def _style_instruction(self, style: str) -> str:
+        return {
+            "comprehensive": "Please provide a comprehensive answer citing given sources only. If the query is unrelated to the context, politely indicate that you don't have the information.",
+            "kg_reasoning": "Using knowledge graph reasoning, analyze relationships and provide an insightful answer citing sources. If the query is unrelated to the context, politely indicate that you don't have the information.",
+            "synthesise": "Synthesize information from all available sources and highlight key insights with citations. If the query is unrelated to the context, politely indicate that you don't have the information.",
+        }.get(style, "Please answer the user's question using the provided context and cite sources.")
 
+    # ---------- Knowledge graph helpers ----------
+    def _format_graph(self, entities: List[str], relations: List[Tuple[str, str, int]]) -> str:
         lines = []
-        for msg in conversation_history[-5:]:
-            try:
-                is_user = msg.get("is_user") if isinstance(msg, dict) else msg.is_user
-                text = msg.get("message") if isinstance(msg, dict) else msg.message
-    
-                # fallback to dict-style
-                if is_user is None:
-                    is_user = msg.get("is_user", False) if isinstance(msg, dict) else False
-                if text is None:
-                    text = msg.get("message", "") if isinstance(msg, dict) else str(msg)
-                role = "User" if is_user else "Assistant"
-                lines.append(f"{role}: {text}")
-            except Exception:
-                lines.append(str(msg))
+        if entities:
+            lines.append(f"Key Entities: {', '.join(entities)}")
+        if relations:
+            lines.append("Related Entities (chunks mentioning both):")
+            lines.extend(f"- {a} <-> {b} ({weight})" for a, b, weight in relations)
         return "\n".join(lines)
 
-    # ---------- Knowledge graph helpers ----------
-    def _build_knowledge_graph(self, documents: List[Document], query: str):
-        # Simplified KG construction; clears previous graph and adds query node + doc nodes
-        self.knowledge_graph.clear()
-        self.knowledge_graph.add_node("query", type="query", content=query)
-        for i, doc in enumerate(documents):
-            doc_id = f"doc_{i}"
-            snippet = (doc.page_content or "")[:200]
-            self.knowledge_graph.add_node(doc_id, type="document", content=snippet)
-            self.knowledge_graph.add_edge("query", doc_id, weight=1.0)
-
-    def _extract_key_entities(self, documents: List[Document], query: str) -> List[str]:
-        """
-        Simple entity extraction fallback: collect capitalised words longer than 5 chars.
-        Replace with NER in production.
-        """
-        entities = set()
-        text = (query or "") + " " + " ".join([(d.page_content or "") for d in documents])
-        for token in text.split():
-            if len(token) > 5 and token[0].isupper():
-                entities.add(token.strip(".,;:()[]"))
-        return list(entities)[:10]
-
-    def _build_knowledge_graph_context(self, documents: List[Document], entities: List[str]) -> str:
+    def _build_knowledge_graph_context(self, documents: List[Document], graph_text: str) -> str:
         ctx = "Knowledge Graph Context:\n"
-        if entities:
-            ctx += f"Key Entities: {', '.join(entities)}\n\n"
+        if graph_text:
+            ctx += f"{graph_text}\n\n"
         ctx += "Relevant Documents:\n"
         for i, doc in enumerate(documents, start=1):
             src = (doc.metadata or {}).get("source", "Unknown")
@@ -0,0 +1,79 @@
+from typing import List, Optional, Tuple
+from ..utils.tokenization import special_token_count, token_spans
+
+# How "good" a cut between two tokens is, judged from the text in between
+_NO_BOUNDARY = -1  # inside a word (sub-word tokens)
+_WORD = 0
+_SENTENCE = 1
+_LINE = 2
+_PARAGRAPH = 3
+
+class TokenTextSplitter:
+    """
+    Single-pass splitter whose chunk_size / chunk_overlap are counted in tokens
+    of the embedding model. chunk_size is the model's whole input window: the
+    special tokens its tokenizer adds ([CLS]/[SEP]) come out of it.
+
+    The text is tokenized once (batched, with character offsets). Each chunk then
+    takes up to chunk_size tokens and is cut at the strongest boundary found in the
+    back half of that window - paragraph, then line, sentence, word - so every
+    token is looked at a bounded number of times. The whole split is linear in
+    the text length, with no recursive re-splitting or repeated joins.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, model_name: Optional[str] = None):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model_name = model_name
+
+    def split_text(self, text: str) -> List[str]:
+        spans = token_spans(text, self.model_name)
+        size = max(self.chunk_size - special_token_count(self.model_name), self.chunk_overlap + 1)
+        total = len(spans)
+        chunks: List[str] = []
+        start = 0
+        while start < total:
+            end = min(start + size, total)
+            if end < total:
+                # only cut in the back half (and past the overlap) so every chunk makes progress
+                low = start + max(size // 2, self.chunk_overlap + 1)
+                end = self._best_cut(text, spans, low, end)
+            chunk = text[spans[start][0]:spans[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= total:
+                break
+            start = self._next_start(text, spans, max(end - self.chunk_overlap, start + 1), end)
+        return chunks
+
+    def _boundary(self, text: str, spans: List[Tuple[int, int]], index: int) -> int:
+        """Strength of a cut just before token `index`"""
+        gap = text[spans[index - 1][1]:spans[index][0]]
+        if not gap:
+            return _NO_BOUNDARY
+        if "\n\n" in gap:
+            return _PARAGRAPH
+        if "\n" in gap:
+            return _LINE
+        if text[spans[index - 1][1] - 1] in ".!?":
+            return _SENTENCE
+        return _WORD
+
+    def _best_cut(self, text: str, spans: List[Tuple[int, int]], low: int, end: int) -> int:
+        best, best_strength = end, _NO_BOUNDARY
+        for index in range(end, max(low, 1), -1):
+            strength = self._boundary(text, spans, index)
+            if strength > best_strength:
+                best, best_strength = index, strength
+                if strength == _PARAGRAPH:
+                    break
+        return best
+
+    def _next_start(self, text: str, spans: List[Tuple[int, int]], start: int, end: int) -> int:
+        # begin the overlap on a word boundary rather than in the middle of a word
+        for index in range(start, end):
+            if self._boundary(text, spans, index) != _NO_BOUNDARY:
+                return index
+        return end
@@ -5,7 +5,12 @@ from langchain.retrievers import EnsembleRetriever
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
 from ..config import settings
+from ..utils.executors import ingest_executor, query_executor
+from .knowledge_graph import knowledge_graph_service
+from ..utils.simhash import simhash, to_hex
+from ..utils.timings import timed
 from typing import List, Optional
+import uuid
 
 class VectorStoreService:
     def __init__(self):
@@ -28,8 +33,9 @@ class VectorStoreService:
                 )
             )
         
+        self.index = pc.Index(settings.PINECONE_INDEX_NAME)
         self.vector_store = PineconeVectorStore(
-            index=pc.Index(settings.PINECONE_INDEX_NAME),
+            index=self.index,
             embedding=self.embeddings
         )
         
@@ -37,25 +43,97 @@ class VectorStoreService:
     
     async def add_documents(self, documents: List[Document]) -> int:
         try:
+            ids = [str(uuid.uuid4()) for _ in documents]
+            await ingest_executor.run(self._stamp, documents, ids)
             texts = [doc.page_content for doc in documents]
             metadatas = [doc.metadata for doc in documents]
             
-            # Use LangChain's Pinecone integration
-            self.vector_store.add_texts(texts, metadatas)
+            # Use LangChain's Pinecone integration (embedding + upsert block, so off the event loop)
+            await ingest_executor.run(self.vector_store.add_texts, texts, metadatas, ids=ids)
             
             self._documents.extend(documents)
+            await ingest_executor.run(knowledge_graph_service.add_chunks, ids, documents)
+            await ingest_executor.run(knowledge_graph_service.flush)
             
             return len(documents)
         except Exception as e:
             print(f"Error adding documents: {e}")
             return 0
     
+    # ---------- Batch primitives for the streaming ingestion pipeline ----------
+    def embed_documents(self, documents: List[Document]) -> List[List[float]]:
+        """Embed one batch of chunks. Blocking; run it off the event loop."""
+        return self.embeddings.embed_documents([doc.page_content for doc in documents])
+    
+    def upsert_embedded(self, documents: List[Document], embeddings: List[List[float]],
+                        ids: Optional[List[str]] = None) -> int:
+        """
+        Upsert an already-embedded batch straight into the Pinecone index, storing the
+        chunk text under the same "text" key PineconeVectorStore reads back at query time.
+        Pass stable `ids` to make re-ingestion idempotent. Each chunk's id and SimHash are
+        also stored in its metadata (see _stamp) and the chunk is added to the knowledge graph
+        (persisted on the next knowledge_graph_service.flush()). Blocking; run it off the event loop.
+        """
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        self._stamp(documents, ids)
+        vectors = [
+            {
+                "id": vector_id,
+                "values": embedding,
+                "metadata": {**(doc.metadata or {}), "text": doc.page_content},
+            }
+            for vector_id, doc, embedding in zip(ids, documents, embeddings)
+        ]
+        self.index.upsert(vectors=vectors)
+        self._documents.extend(documents)
+        knowledge_graph_service.add_chunks(ids, documents)
+        return len(vectors)
+    
+    def _stamp(self, documents: List[Document], ids: List[str]):
+        """
+        Store each chunk's vector id ("chunk_id") and the SimHash of its text ("simhash",
+        hex) in its metadata, so query time can map hits to the knowledge graph and drop
+        near-duplicates without re-hashing. Blocking (hashing is CPU-bound).
+        """
+        for doc, vector_id in zip(documents, ids):
+            doc.metadata = {
+                **(doc.metadata or {}),
+                "chunk_id": vector_id,
+                "simhash": to_hex(simhash(doc.page_content)),
+            }
+    
+    def delete_ids(self, ids: List[str]) -> int:
+        """
+        Delete vectors by id from Pinecone and drop matching chunks (by their
+        "chunk_id" metadata) from the in-memory BM25 corpus and the knowledge graph. Blocking.
+        """
+        if not ids:
+            return 0
+        for start in range(0, len(ids), 1000):  # Pinecone caps deletes at 1000 ids per call
+            self.index.delete(ids=ids[start:start + 1000])
+        doomed = set(ids)
+        self._documents = [
+            doc for doc in self._documents
+            if (doc.metadata or {}).get("chunk_id") not in doomed
+        ]
+        knowledge_graph_service.remove_chunks(ids)
+        return len(ids)
+    
     async def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        semantic_retriever = self.vector_store.as_retriever(search_kwargs={"k": k})
-        sem_docs = semantic_retriever.get_relevant_documents(query)
-        return sem_docs
+        return await query_executor.run(self._similarity_search, query, k)
+    
+    def _similarity_search(self, query: str, k: int) -> List[Document]:
+        # embed and query separately (what the retriever does internally) so each is timed
+        with timed("embedding"):
+            query_embedding = self.embeddings.embed_query(query)
+        with timed("pinecone"):
+            return self.vector_store.similarity_search_by_vector(query_embedding, k=k)
     
     async def hybrid_search(self, query: str, k: int = 2) -> List[Document]:
+        # query embedding, Pinecone round-trip and the BM25 build all block
+        return await query_executor.run(self._hybrid_search, query, k)
+    
+    def _hybrid_search(self, query: str, k: int) -> List[Document]:
         """
         Hybrid RAG retrieval:
         - semantic retriever from the vector store (Pinecone)
@@ -66,20 +144,22 @@ class VectorStoreService:
         
         if not self._documents:
             # nothing to search for BM25; fallback to pure semantic
-            return await self.similarity_search(query, k=k)
+            return self._similarity_search(query, k)
 
         # create a semantic retriever from the vector store
         semantic_retriever = self.vector_store.as_retriever(search_kwargs={"k": k})
 
         # build BM25 retriever from in-memory documents
-        bm25_retriever = BM25Retriever.from_documents(self._documents, k=k)
+        with timed("bm25_build"):
+            bm25_retriever = BM25Retriever.from_documents(self._documents, k=k)
 
         try:
             # ensemble the two retrievers. adjust weights as needed.
             ensemble = EnsembleRetriever(retrievers=[semantic_retriever, bm25_retriever],
                                          weights=[0.7, 0.3])
             # common method name for retrievers in LangChain
-            hybrid_results = ensemble.get_relevant_documents(query)
+            with timed("hybrid_ensemble"):
+                hybrid_results = ensemble.get_relevant_documents(query)
             
         except Exception as e:
             # Robust fallback: do both separately and merge results
@@ -0,0 +1,95 @@
+"""
+Benchmark for query-time entity extraction in the knowledge_graph variant.
+
+Compares the old token scan (capitalised tokens longer than 5 characters, from a
+set) with KnowledgeGraphService.lookup, which reads the entities each retrieved
+chunk was indexed with at ingestion time and only scans the question. Both run
+on the same contexts. The corpus is any folder of .txt/.md files, cut into
+chunks and indexed into a throwaway graph. The token scan's picks depend on set
+iteration order, which changes with PYTHONHASHSEED. Run it twice to see.
+
+    python -m app.tools.entity_bench /path/to/corpus --docs 5 --chunk-chars 1000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, List
+from langchain.schema import Document
+from ..services.knowledge_graph import KnowledgeGraphService
+
+def token_scan(text: str) -> List[str]:
+    """The extractor RAGService used before the knowledge graph was built at ingestion"""
+    entities = set()
+    for token in text.split():
+        if len(token) > 5 and token[0].isupper():
+            entities.add(token.strip(".,;:()[]"))
+    return list(entities)[:10]
+
+def load_chunks(folder: str, chunk_chars: int) -> List[Document]:
+    chunks = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if not name.lower().endswith((".txt", ".md")):
+                continue
+            with open(os.path.join(root, name), 'r', encoding='utf-8', errors='ignore') as file:
+                text = file.read()
+            for start in range(0, len(text), chunk_chars):
+                chunks.append(Document(
+                    page_content=text[start:start + chunk_chars],
+                    metadata={"source": name, "chunk_id": f"{name}-{start}"},
+                ))
+    return chunks
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description="Token scan vs ingestion-time entity lookup")
+    parser.add_argument("corpus", help="folder of .txt/.md files")
+    parser.add_argument("--docs", type=int, default=5, help="retrieved chunks per context")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--contexts", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.corpus, args.chunk_chars)
+    if len(chunks) < args.docs:
+        parser.error(f"corpus has {len(chunks)} chunks, need at least {args.docs}")
+    with tempfile.TemporaryDirectory() as folder:
+        graph = KnowledgeGraphService(os.path.join(folder, "knowledge_graph.json"))
+        start = time.perf_counter()
+        graph.add_chunks([doc.metadata["chunk_id"] for doc in chunks], chunks)
+        index_seconds = time.perf_counter() - start
+
+    rng = random.Random(11)
+    contexts = []
+    for _ in range(args.contexts):
+        docs = rng.sample(chunks, args.docs)
+        query = rng.choice(docs).page_content[:120]
+        contexts.append((query, docs, query + "\n" + "\n".join(doc.page_content for doc in docs)))
+    # chunks retrieved from before the graph existed carry no chunk_id and are extracted on the fly
+    unindexed = [(query, [Document(page_content=doc.page_content) for doc in docs]) for query, docs, _ in contexts]
+
+    stats = graph.stats()
+    print(f"corpus:  {len(chunks)} chunks, {stats['entities']} entities, {stats['relations']} relations, "
+          f"indexed in {index_seconds * 1000:.0f} ms")
+    print(f"context: {args.docs} chunks, ~{sum(len(text) for _, _, text in contexts) // len(contexts)} chars")
+    runs = (
+        ("token scan", lambda: [token_scan(text) for _, _, text in contexts]),
+        ("graph lookup", lambda: [graph.lookup(docs, query) for query, docs, _ in contexts]),
+        ("lookup, unindexed", lambda: [graph.lookup(docs, query) for query, docs in unindexed]),
+    )
+    for name, fn in runs:
+        seconds = timed(fn, args.repeat) / len(contexts)
+        print(f"{name:<19}{seconds * 1000:>8.3f} ms/context")
+    query, docs, text = contexts[0]
+    print(f"sample token scan:   {token_scan(text)[:5]}")
+    print(f"sample graph lookup: {graph.lookup(docs, query)[0][:5]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the Groq chat-completions API, for load tests and offline runs.
+
+Serves POST /openai/v1/chat/completions (the path the groq SDK calls) with canned
+text, streaming or not, after a log-normal time-to-first-token and at a fixed
+token rate. Enforces per-model requests/tokens-per-minute limits the way Groq does:
+x-ratelimit-* headers on every response and 429 + retry-after once over budget.
+Can also inject server errors.
+
+    python -m app.tools.llm_stub --port 9000 --ttft-ms 400 --rpm 300 --tpm 60000
+    GROQ_BASE_URL=http://localhost:9000 python -m app serve
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LOREM = (
+    "Retrieval augmented generation combines a retriever with a language model. "
+    "The retriever selects passages relevant to the question, and the model writes "
+    "an answer grounded in those passages, citing the documents it used. "
+)
+
+class RateWindow:
+    """Fixed one-minute request and token budget for one model"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.started = time.monotonic()
+        self.requests = 0
+        self.tokens = 0
+
+    def _roll(self, now: float):
+        if now - self.started >= 60:
+            self.started = now
+            self.requests = 0
+            self.tokens = 0
+
+    def admit(self, tokens: int) -> bool:
+        now = time.monotonic()
+        self._roll(now)
+        if (self.rpm and self.requests + 1 > self.rpm) or (self.tpm and self.tokens + tokens > self.tpm):
+            return False
+        self.requests += 1
+        self.tokens += tokens
+        return True
+
+    def headers(self) -> Dict[str, str]:
+        # unlimited dimensions send no headers, so clients don't read them as exhausted
+        reset = f"{max(0.0, 60 - (time.monotonic() - self.started)):.2f}s"
+        headers = {}
+        if self.rpm:
+            headers["x-ratelimit-limit-requests"] = str(self.rpm)
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.rpm - self.requests))
+            headers["x-ratelimit-reset-requests"] = reset
+        if self.tpm:
+            headers["x-ratelimit-limit-tokens"] = str(self.tpm)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tpm - self.tokens))
+            headers["x-ratelimit-reset-tokens"] = reset
+        return headers
+
+    def retry_after(self) -> str:
+        return f"{max(0.0, 60 - (time.monotonic() - self.started)):.2f}"
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Groq API stub")
+    windows: Dict[str, RateWindow] = {}
+    counters = {"requests": 0, "rate_limited": 0, "errors": 0}
+    # log-normal TTFT with the requested median, sigma derived from the p95/median ratio
+    mu = math.log(args.ttft_ms / 1000)
+    sigma = math.log(max(args.ttft_p95_ms / args.ttft_ms, 1.0)) / 1.645
+
+    def completion_tokens(max_tokens: int) -> List[str]:
+        count = min(max_tokens, max(1, int(random.gauss(args.output_tokens, args.output_tokens * 0.2))))
+        words = (LOREM * (count // 30 + 1)).split(" ")
+        return [word + " " for word in words[:count]]
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        messages = body.get("messages", [])
+        max_tokens = int(body.get("max_tokens") or 1024)
+        prompt_tokens = sum(len(str(message.get("content") or "")) for message in messages) // 4
+        counters["requests"] += 1
+
+        window = windows.setdefault(model, RateWindow(args.rpm, args.tpm))
+        if not window.admit(prompt_tokens + max_tokens):
+            counters["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429, headers={**window.headers(), "retry-after": window.retry_after()},
+                content={"error": {"message": f"Rate limit reached for model {model}", "type": "tokens", "code": "rate_limit_exceeded"}}
+            )
+        if random.random() < args.error_rate:
+            counters["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable (injected)", "type": "internal_server_error"}})
+
+        await asyncio.sleep(random.lognormvariate(mu, sigma))
+        tokens = completion_tokens(max_tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(tokens) / args.tokens_per_second)
+            return JSONResponse(headers=window.headers(), content={
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def chunk(delta: Dict[str, Any], finish_reason=None, **extra) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(1 / args.tokens_per_second)
+            yield chunk({}, "stop", x_groq={"usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers=window.headers())
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Groq-compatible chat-completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="median time to first token")
+    parser.add_argument("--ttft-p95-ms", type=float, default=1200, help="p95 time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250)
+    parser.add_argument("--output-tokens", type=int, default=200, help="mean completion length")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute per model (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute per model (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Open-loop load generator for the backend API.
+
+Fires requests at a fixed target rate (independent of how fast responses come
+back, so queueing shows up as latency instead of silently lowering the load)
+against /chat, /direct-chat and /upload, cycling through the RAG variants, and
+reports throughput, latency percentiles and error rates per endpoint and variant.
+Pair with app.tools.llm_stub to size a deployment without spending Groq quota.
+
+    python -m app.tools.load_test --rps 20 --duration 60 --mix chat=6,direct-chat=3,upload=1
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+
+RAG_VARIANTS = ["vanilla", "knowledge_graph", "hybrid"]
+QUESTIONS = [
+    "What is retrieval augmented generation?",
+    "Summarize the main findings of the uploaded documents.",
+    "How does the knowledge graph relate the key entities?",
+    "Which sources discuss evaluation metrics?",
+    "Explain the training procedure described in the paper.",
+]
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight or 1)
+    unknown = set(weights) - {"chat", "direct-chat", "upload"}
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.results: Dict[str, List[tuple]] = defaultdict(list)  # scenario -> [(ok, seconds, status)]
+        self.variants = itertools.cycle(args.variants)
+        self.sequence = itertools.count()
+
+    async def run(self) -> Dict[str, Dict]:
+        weights = parse_mix(self.args.mix)
+        endpoints = list(weights)
+        limits = httpx.Limits(max_connections=self.args.max_connections,
+                              max_keepalive_connections=self.args.max_connections)
+        async with httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout, limits=limits) as client:
+            tasks = []
+            start = time.perf_counter()
+            total = int(self.args.rps * self.args.duration)
+            for i in range(total):
+                # open loop: request i is sent at start + i/rps whether or not earlier ones finished
+                delay = start + i / self.args.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                endpoint = random.choices(endpoints, weights=[weights[name] for name in endpoints])[0]
+                tasks.append(asyncio.create_task(self._fire(client, endpoint)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return self._report(elapsed)
+
+    async def _fire(self, client: httpx.AsyncClient, endpoint: str):
+        number = next(self.sequence)
+        variant = next(self.variants)
+        question = random.choice(QUESTIONS)
+        if not self.args.repeat_questions:
+            # unique prompts so the completion cache and request coalescing don't flatter the numbers
+            question = f"{question} (request {number})"
+
+        if endpoint == "chat":
+            scenario = f"chat/{variant}"
+            request = client.post("/chat", json={
+                "message": question, "conversation_history": [], "llm_choice": self.args.llm,
+                "rag_variant": variant, "use_internet_search": self.args.internet, "use_cache": self.args.cache,
+            })
+        elif endpoint == "direct-chat":
+            scenario = f"direct-chat/{variant}"
+            request = client.post("/direct-chat", params={
+                "message": question, "llm": self.args.llm, "rag": variant,
+                "use_internet": self.args.internet, "use_cache": self.args.cache,
+            })
+        else:
+            scenario = "upload"
+            body = (f"Load test document {uuid.uuid4()}.\n\n" + " ".join(QUESTIONS) + "\n") * self.args.upload_kb * 3
+            request = client.post("/upload", files={"file": (f"loadtest-{number}.txt", body.encode(), "text/plain")})
+
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+            if ok and endpoint == "upload" and self.args.wait_ingestion:
+                ok = await self._wait_for_job(client, response.json()["status_url"])
+            self.results[scenario].append((ok, time.perf_counter() - started, response.status_code))
+        except Exception as e:
+            self.results[scenario].append((False, time.perf_counter() - started, type(e).__name__))
+
+    async def _wait_for_job(self, client: httpx.AsyncClient, status_url: str) -> bool:
+        while True:
+            job = (await client.get(status_url)).json()
+            if job["status"] in ("completed", "failed"):
+                return job["status"] == "completed"
+            await asyncio.sleep(0.5)
+
+    def _report(self, elapsed: float) -> Dict[str, Dict]:
+        report = {}
+        for scenario, results in sorted(self.results.items()):
+            latencies = sorted(seconds for ok, seconds, _ in results if ok)
+            errors = [status for ok, _, status in results if not ok]
+            report[scenario] = {
+                "requests": len(results),
+                "ok": len(latencies),
+                "error_rate": len(errors) / len(results),
+                "throughput_rps": len(latencies) / elapsed,
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                "errors": {str(status): errors.count(status) for status in set(errors)},
+            }
+        return report
+
+def print_report(report: Dict[str, Dict]):
+    fmt = lambda value: "-" if value is None else f"{value:.3f}"
+    print(f"{'scenario':<28}{'reqs':>7}{'ok':>7}{'err%':>7}{'rps':>8}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}")
+    for scenario, row in report.items():
+        print(f"{scenario:<28}{row['requests']:>7}{row['ok']:>7}{row['error_rate'] * 100:>6.1f}%"
+              f"{row['throughput_rps']:>8.2f}{fmt(row['p50']):>9}{fmt(row['p95']):>9}{fmt(row['p99']):>9}")
+        if row["errors"]:
+            print(f"{'':<28}errors: {row['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the RAG backend")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=5, help="target request rate")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep sending")
+    parser.add_argument("--mix", default="chat=6,direct-chat=3,upload=1", help="endpoint weights")
+    parser.add_argument("--variants", nargs="+", default=RAG_VARIANTS, choices=RAG_VARIANTS)
+    parser.add_argument("--llm", default="llama3-70b")
+    parser.add_argument("--internet", action="store_true", help="enable web/arXiv search in chat requests")
+    parser.add_argument("--cache", action="store_true", help="allow completion-cache hits")
+    parser.add_argument("--repeat-questions", action="store_true", help="reuse identical prompts")
+    parser.add_argument("--upload-kb", type=int, default=4, help="approximate size of each uploaded file")
+    parser.add_argument("--wait-ingestion", action="store_true", help="time uploads until their job finishes")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(LoadTest(args).run())
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, List, Optional
+from ..config import settings
+
+class DeadlineExceeded(Exception):
+    """A required stage could not finish before the request deadline"""
+
+class Deadline:
+    """Absolute time budget of one request, plus the optional stages it had to drop"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.dropped: List[str] = []
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def drop(self, stage: str, reason: str):
+        self.dropped.append(f"{stage}: {reason}")
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+def start_deadline(seconds: Optional[float] = None) -> Deadline:
+    """Set the deadline for the current request (and every task it spawns)"""
+    deadline = Deadline(seconds or settings.REQUEST_DEADLINE_SECONDS)
+    _current.set(deadline)
+    return deadline
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+def clear_deadline():
+    """Detach background work started from a request from that request's deadline"""
+    _current.set(None)
+
+async def within_deadline(stage: str, awaitable: Awaitable, cap: Optional[float] = None,
+                          optional: bool = True, default: Any = None, reserve: float = 0.0) -> Any:
+    """
+    Await `awaitable` bounded by the current deadline (less `reserve` seconds kept
+    for later stages) and by `cap`. An optional stage that would get less than
+    DEADLINE_MIN_STAGE_SECONDS is skipped, and one that runs out of time is cut;
+    both are recorded on the deadline and return `default`. A required stage that
+    runs out of time raises DeadlineExceeded. Without a deadline only `cap` applies.
+    """
+    deadline = _current.get()
+    timeout = cap
+    if deadline is not None:
+        left = deadline.remaining() - (reserve if optional else 0.0)
+        timeout = left if timeout is None else min(timeout, left)
+        if optional and left < settings.DEADLINE_MIN_STAGE_SECONDS:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            deadline.drop(stage, f"skipped, {max(deadline.remaining(), 0):.1f}s left")
+            return default
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        if optional:
+            if deadline is not None:
+                deadline.drop(stage, f"cut after {timeout:.1f}s")
+            return default
+        raise DeadlineExceeded(f"{stage} did not finish within the {deadline.seconds if deadline else timeout:.0f}s deadline")
@@ -0,0 +1,40 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from ..config import settings
+
+class BoundedExecutor:
+    """
+    A dedicated thread pool plus a semaphore sized to it. Callers wait on the
+    semaphore (in the event loop) rather than in the pool's internal queue, so at
+    most `max_workers` jobs are ever handed to the pool, a cancelled request never
+    occupies a thread, and one workload cannot grab threads meant for another.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking callable on this pool without blocking the event loop. Like
+        asyncio.to_thread, it runs in a copy of the caller's context, so request-scoped
+        context variables (stage timings) are visible in the worker thread.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._pool, functools.partial(context.run, func, *args, **kwargs))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+# File parsing, splitting, embedding and upserts for uploads/syncs
+ingest_executor = BoundedExecutor("ingest", settings.INGEST_THREADS)
+# Blocking retrieval on the chat path (Pinecone queries, BM25)
+query_executor = BoundedExecutor("query", settings.QUERY_THREADS)
+# Blocking web and arXiv search clients; kept apart so slow sites can't starve retrieval
+search_executor = BoundedExecutor("search", settings.SEARCH_THREADS)
@@ -0,0 +1,18 @@
+import os
+from typing import Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process right now, or None if it cannot be measured"""
+    try:
+        # Linux: second field of /proc/self/statm is resident pages; cheap enough to poll per page
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
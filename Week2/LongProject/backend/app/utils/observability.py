@@ -1,4 +1,7 @@
+import json
 import os
+import time
+from typing import Dict, Optional
 from langsmith import Client
 from langchain.callbacks.tracers import LangChainTracer
 
@@ -10,9 +13,17 @@ def setup_observability():
         return tracer
     return None
 
-def log_rag_operation(operation: str, query: str, documents_retrieved: int, response_time: float):
-    # Simple logging for observability
-    print(f"RAG Operation: {operation}")
-    print(f"Query: {query}")
-    print(f"Documents Retrieved: {documents_retrieved}")
-    print(f"Response Time: {response_time:.2f}s")
\ No newline at end of file
+def log_rag_operation(operation: str, query: str, documents_retrieved: int, response_time: float,
+                      timings: Optional[Dict[str, float]] = None, **fields):
+    # One JSON line per request, so slow stages can be found with grep/jq or a log pipeline
+    record = {
+        "event": "rag_operation",
+        "timestamp": time.time(),
+        "operation": operation,
+        "query": query[:200],
+        "documents_retrieved": documents_retrieved,
+        "response_time": round(response_time, 4),
+        "timings": timings or {},
+        **fields,
+    }
+    print(json.dumps(record, default=str), flush=True)
\ No newline at end of file
@@ -0,0 +1,78 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BITS = 64
+SHINGLE_WORDS = 3
+
+_WORD = re.compile(r"\w+")
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word 3-shingles. Texts that share most of their shingles
+    get signatures a few bits apart; unrelated texts differ in about half the bits.
+    """
+    words = _WORD.findall((text or "").casefold())
+    if len(words) < SHINGLE_WORDS:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    if not shingles:
+        return 0
+    # one binary string per shingle; zip(*) turns them into per-bit columns in C, not a Python loop per bit
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for shingle in shingles
+    ]
+    half = len(rows) / 2
+    signature = 0
+    for column in zip(*rows):
+        signature = (signature << 1) | (column.count("1") > half)
+    return signature
+
+def to_hex(signature: int) -> str:
+    # stored as a string: Pinecone metadata numbers are float64 and would lose the low bits
+    return f"{signature:016x}"
+
+def from_hex(value) -> Optional[int]:
+    try:
+        return int(value, 16)
+    except (TypeError, ValueError):
+        return None
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate check. A signature is a duplicate if it is within
+    `max_bits` of one already kept. Signatures are split into max_bits + 1 bands;
+    two signatures within max_bits of each other must agree on at least one whole
+    band (pigeonhole), so each check only compares against the kept signatures
+    sharing a band value: O(1) expected per item, O(n) for a list.
+    """
+
+    def __init__(self, max_bits: int):
+        self.max_bits = max_bits
+        bands = max_bits + 1
+        width = BITS // bands
+        self._bands: List[Tuple[int, int]] = [
+            (start, (BITS - start) if index == bands - 1 else width)
+            for index, start in enumerate(range(0, width * bands, width))
+        ]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+
+    def _keys(self, signature: int) -> Iterable[int]:
+        for start, width in self._bands:
+            yield (signature >> start) & ((1 << width) - 1)
+
+    def add(self, signature: int) -> bool:
+        """Keep `signature` and return True, or return False if it is a near-duplicate"""
+        keys = list(self._keys(signature))
+        for buckets, key in zip(self._buckets, keys):
+            for kept in buckets.get(key, ()):
+                if hamming(kept, signature) <= self.max_bits:
+                    return False
+        for buckets, key in zip(self._buckets, keys):
+            buckets.setdefault(key, []).append(signature)
+        return True
@@ -0,0 +1,55 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+class StageTimings:
+    """
+    Seconds spent in each stage of one request. Concurrent stages overlap, so the
+    stages can add up to more than the request's wall-clock time.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages: Dict[str, float] = {}
+        self._lock = threading.Lock()  # stages also record from executor threads
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            stages = {stage: round(seconds, 4) for stage, seconds in self._stages.items()}
+        stages["total"] = round(time.perf_counter() - self.started, 4)
+        return stages
+
+_current: ContextVar[Optional[StageTimings]] = ContextVar("request_timings", default=None)
+
+def start_timings() -> StageTimings:
+    """Start collecting stage timings for the current request (and every task it spawns)"""
+    timings = StageTimings()
+    _current.set(timings)
+    return timings
+
+def current_timings() -> Optional[StageTimings]:
+    return _current.get()
+
+def clear_timings():
+    """Detach background work started from a request from that request's timings"""
+    _current.set(None)
+
+def record_stage(stage: str, seconds: float):
+    timings = _current.get()
+    if timings is not None:
+        timings.record(stage, seconds)
+
+@contextmanager
+def timed(stage: str):
+    """Add the time spent in the block to `stage` of the current request, if one is being timed"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
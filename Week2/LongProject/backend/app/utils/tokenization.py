@@ -0,0 +1,83 @@
+import re
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Texts are tokenized in batches of newline-aligned segments of about this many
+# characters; no tokenizer we use merges tokens across a newline, so offsets stay exact
+SEGMENT_CHARS = 16 * 1024
+BATCH_SEGMENTS = 32
+
+# Rough stand-in when no HF tokenizer is available: words and single punctuation marks
+_FALLBACK_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+_tokenizer_lock = threading.Lock()
+
+@lru_cache(maxsize=8)
+def _load_tokenizer(model_name: str):
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    except Exception as e:
+        print(f"Tokenizer for {model_name} unavailable, using regex token estimate: {e}")
+        return None
+
+def get_tokenizer(model_name: str):
+    # from_pretrained is not safe to race from several executor threads
+    with _tokenizer_lock:
+        return _load_tokenizer(model_name)
+
+def _segments(text: str) -> List[Tuple[int, str]]:
+    """Split text into (offset, segment) pieces ending on newlines, ~SEGMENT_CHARS each"""
+    segments = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + SEGMENT_CHARS, length)
+        if end < length:
+            newline = text.rfind("\n", start, end)
+            if newline > start:
+                end = newline + 1
+        segments.append((start, text[start:end]))
+        start = end
+    return segments
+
+def token_spans(text: str, model_name: Optional[str] = None) -> List[Tuple[int, int]]:
+    """
+    Character (start, end) offsets of every token of `text` under `model_name`'s
+    tokenizer, computed in one batched pass. Falls back to a regex estimate.
+    """
+    tokenizer = get_tokenizer(model_name) if model_name else None
+    if tokenizer is None or not getattr(tokenizer, "is_fast", False):
+        return [match.span() for match in _FALLBACK_TOKEN.finditer(text)]
+
+    spans: List[Tuple[int, int]] = []
+    segments = _segments(text)
+    for batch_start in range(0, len(segments), BATCH_SEGMENTS):
+        batch = segments[batch_start:batch_start + BATCH_SEGMENTS]
+        encoded = tokenizer(
+            [segment for _, segment in batch],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        for (offset, _), offsets in zip(batch, encoded["offset_mapping"]):
+            spans.extend((offset + start, offset + end) for start, end in offsets if end > start)
+    return spans
+
+def has_tokenizer(model_name: Optional[str]) -> bool:
+    """True when counts for `model_name` are exact rather than the regex estimate"""
+    tokenizer = get_tokenizer(model_name) if model_name else None
+    return tokenizer is not None and getattr(tokenizer, "is_fast", False)
+
+def special_token_count(model_name: Optional[str]) -> int:
+    """Tokens the model's tokenizer adds around every input ([CLS] and [SEP] for BERT-style models)"""
+    tokenizer = get_tokenizer(model_name) if model_name else None
+    if tokenizer is None or not hasattr(tokenizer, "num_special_tokens_to_add"):
+        return 0
+    return tokenizer.num_special_tokens_to_add(pair=False)
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    return len(token_spans(text, model_name))
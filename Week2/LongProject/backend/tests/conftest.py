@@ -0,0 +1,18 @@
+"""
+Importing app.services.vector_store connects to Pinecone and loads the embedding
+model. Tests never talk to either, so modules that import it get this in-memory
+stand-in instead.
+"""
+import sys
+import types
+
+class FakeVectorStore:
+    def embed_documents(self, documents):
+        return [[0.0] * 384 for _ in documents]
+
+    def upsert_embedded(self, documents, embeddings):
+        return len(documents)
+
+_vector_store = types.ModuleType("app.services.vector_store")
+_vector_store.vector_store_service = FakeVectorStore()
+sys.modules.setdefault("app.services.vector_store", _vector_store)
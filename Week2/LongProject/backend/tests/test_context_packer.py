@@ -0,0 +1,26 @@
+from app.services.context_packer import ContextPacker
+
+# not in LLM_TOKENIZERS: counts use the regex estimate padded by FALLBACK_TOKEN_RATIO,
+# so max_tokens=4 allows 3 regex tokens, 8 allows 6
+MODEL = "no-tokenizer"
+
+packer = ContextPacker()
+
+def test_truncate_keeps_a_sentence_ending_exactly_at_the_limit():
+    text = "First sentence. Second sentence runs on past the budget."
+    assert packer.truncate(text, 4, MODEL) == "First sentence."
+
+def test_truncate_falls_back_to_a_word_boundary():
+    text = "One two three four five six seven."
+    assert packer.truncate(text, 4, MODEL) == "One two three"
+
+def test_truncate_returns_short_text_unchanged():
+    assert packer.truncate("Short text.", 100, MODEL) == "Short text."
+
+def test_truncate_tail_starts_at_a_sentence_beginning_exactly_at_the_limit():
+    text = "Alpha beta gamma. Delta epsilon. Zeta eta."
+    assert packer.truncate_tail(text, 8, MODEL) == "Delta epsilon. Zeta eta."
+
+def test_truncate_tail_falls_back_to_a_word_boundary():
+    text = "One two three four five six seven"
+    assert packer.truncate_tail(text, 4, MODEL) == "five six seven"
@@ -0,0 +1,71 @@
+import zipfile
+from app.services.document_processor import document_processor
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+def paragraph(text, style=None):
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{properties}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+def table(*rows):
+    cells = lambda row: "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in row)
+    return "<w:tbl>" + "".join(f"<w:tr>{cells(row)}</w:tr>" for row in rows) + "</w:tbl>"
+
+def text_box(text):
+    # Word stores a text box twice: the drawing in mc:Choice, a VML copy in mc:Fallback
+    box = f"<w:txbxContent>{paragraph(text)}</w:txbxContent>"
+    return (
+        f"<w:p><w:r><mc:AlternateContent><mc:Choice Requires=\"wps\">{box}</mc:Choice>"
+        f"<mc:Fallback>{box}</mc:Fallback></mc:AlternateContent></w:r></w:p>"
+    )
+
+def sections(tmp_path, *body):
+    path = tmp_path / "doc.docx"
+    xml = f'<w:document xmlns:w="{W}" xmlns:mc="{MC}"><w:body>{"".join(body)}</w:body></w:document>'
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", xml)
+    return list(document_processor._iter_docx_sections(str(path), "doc.docx"))
+
+def test_headings_nest_under_the_title(tmp_path):
+    result = sections(
+        tmp_path,
+        paragraph("Report", "Title"),
+        paragraph("Intro text"),
+        paragraph("Scope", "Heading1"),
+        paragraph("Details", "Heading2"),
+        paragraph("Detail text"),
+        paragraph("Results", "Heading1"),
+        paragraph("Result text"),
+    )
+    assert [(text, meta["heading_path"]) for text, meta in result] == [
+        ("Intro text", ["Report"]),
+        ("Detail text", ["Report", "Scope", "Details"]),
+        ("Result text", ["Report", "Results"]),
+    ]
+    assert result[-1][1]["heading"] == "Results"
+
+def test_tables_are_sections_of_their_own_in_reading_order(tmp_path):
+    result = sections(
+        tmp_path,
+        paragraph("Before"),
+        table(("Name", "Qty"), ("Bolt", "4")),
+        paragraph("After"),
+    )
+    assert [(text, meta["section"]) for text, meta in result] == [
+        ("Before", "text"),
+        ("Name | Qty\nBolt | 4", "table"),
+        ("After", "text"),
+    ]
+    assert result[1][1]["table_index"] == 0
+
+def test_text_box_is_read_once(tmp_path):
+    result = sections(tmp_path, paragraph("Body"), text_box("Boxed"))
+    text = "\n".join(text for text, _ in result)
+    assert text.count("Boxed") == 1
+    assert "Body" in text
+
+def test_body_without_headings_has_no_heading_metadata(tmp_path):
+    (text, meta), = sections(tmp_path, paragraph("Plain"))
+    assert text == "Plain"
+    assert "heading" not in meta and "heading_path" not in meta
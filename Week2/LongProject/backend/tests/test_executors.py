@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+from app.utils.executors import BoundedExecutor
+from app.utils.timings import start_timings, current_timings
+
+def test_concurrency_is_capped_at_max_workers():
+    executor = BoundedExecutor("test-cap", 2)
+    lock = threading.Lock()
+    running = peak = 0
+
+    def work():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    async def scenario():
+        await asyncio.gather(*(executor.run(work) for _ in range(8)))
+
+    asyncio.run(scenario())
+    executor.shutdown()
+    assert peak == 2
+
+def test_event_loop_stays_responsive_while_the_pool_is_busy():
+    executor = BoundedExecutor("test-lag", 2)
+
+    async def scenario():
+        busy = [asyncio.create_task(executor.run(time.sleep, 0.3)) for _ in range(4)]
+        worst = 0.0
+        loop = asyncio.get_running_loop()
+        for _ in range(20):
+            start = loop.time()
+            await asyncio.sleep(0.01)
+            worst = max(worst, loop.time() - start - 0.01)
+        await asyncio.gather(*busy)
+        return worst
+
+    worst = asyncio.run(scenario())
+    executor.shutdown()
+    assert worst < 0.1
+
+def test_a_saturated_pool_does_not_starve_another():
+    ingest = BoundedExecutor("test-ingest", 1)
+    query = BoundedExecutor("test-query", 1)
+
+    async def scenario():
+        release = threading.Event()
+        busy = [asyncio.create_task(ingest.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        answer = await asyncio.wait_for(query.run(lambda: "answer"), timeout=1)
+        release.set()
+        await asyncio.gather(*busy)
+        return answer
+
+    assert asyncio.run(scenario()) == "answer"
+    ingest.shutdown()
+    query.shutdown()
+
+def test_work_runs_in_the_callers_context():
+    executor = BoundedExecutor("test-context", 1)
+
+    async def scenario():
+        timings = start_timings()
+        return timings, await executor.run(current_timings)
+
+    timings, seen = asyncio.run(scenario())
+    executor.shutdown()
+    assert seen is timings
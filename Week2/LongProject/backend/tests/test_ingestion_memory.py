@@ -0,0 +1,60 @@
+import asyncio
+from app.config import settings
+from app.services import ingestion_pipeline as pipeline_module
+from app.services.ingestion_pipeline import IngestionPipeline
+
+MB = 1024 * 1024
+
+def run(queues, readings, monkeypatch, cap_mb=100):
+    """Run _wait_for_memory with RSS taken from `readings`; returns how many were used"""
+    readings = list(readings)
+    used = []
+
+    def rss():
+        used.append(readings.pop(0) if len(readings) > 1 else readings[0])
+        return used[-1]
+
+    monkeypatch.setattr(settings, "INGEST_MAX_RSS_MB", cap_mb)
+    monkeypatch.setattr(pipeline_module, "current_rss_bytes", rss)
+    asyncio.run(asyncio.wait_for(IngestionPipeline(queue_size=4)._wait_for_memory(queues), timeout=2))
+    return len(used)
+
+def filled_queue():
+    queue = asyncio.Queue()
+    queue.put_nowait("pending batch")
+    return queue
+
+def test_under_the_cap_does_not_wait(monkeypatch):
+    assert run([filled_queue()], [50 * MB], monkeypatch) == 1
+
+def test_over_the_cap_waits_until_rss_drops(monkeypatch):
+    assert run([filled_queue()], [150 * MB, 150 * MB, 150 * MB, 90 * MB], monkeypatch) == 4
+
+def test_over_the_cap_with_drained_queues_carries_on(monkeypatch):
+    # a cap below the baseline footprint must slow ingestion down, never deadlock it
+    assert run([asyncio.Queue()], [500 * MB], monkeypatch) == 1
+
+def test_waits_only_while_downstream_has_work(monkeypatch):
+    queue = filled_queue()
+
+    async def drain():
+        await asyncio.sleep(0.12)
+        queue.get_nowait()
+
+    async def scenario():
+        monkeypatch.setattr(settings, "INGEST_MAX_RSS_MB", 100)
+        monkeypatch.setattr(pipeline_module, "current_rss_bytes", lambda: 500 * MB)
+        drainer = asyncio.create_task(drain())
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.wait_for(IngestionPipeline(queue_size=4)._wait_for_memory([queue]), timeout=2)
+        await drainer
+        return loop.time() - start
+
+    assert asyncio.run(scenario()) >= 0.1
+
+def test_unmeasurable_rss_does_not_wait(monkeypatch):
+    assert run([filled_queue()], [150 * MB, None], monkeypatch) == 2
+
+def test_zero_cap_disables_the_check(monkeypatch):
+    assert run([filled_queue()], [500 * MB], monkeypatch, cap_mb=0) == 0
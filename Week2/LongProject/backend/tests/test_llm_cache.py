@@ -0,0 +1,66 @@
+import time
+from app.services import llm_cache as cache_module
+from app.services.llm_cache import CompletionCache
+
+def make_cache(tmp_path, **kwargs):
+    return CompletionCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+def test_memory_hit_then_disk_hit_after_restart(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("k", "answer")
+    assert cache.get("k") == "answer"
+    assert cache.stats()["memory_hits"] == 1
+
+    restarted = make_cache(tmp_path)
+    assert restarted.get("k") == "answer"
+    assert restarted.get("k") == "answer"
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+def test_memory_tier_is_bounded_by_entries(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert cache.stats()["memory_entries"] == 2
+    # evicted from memory, still on disk
+    assert cache.get("a") == "a"
+    assert cache.stats()["disk_hits"] == 1
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl_seconds=10)
+    cache.set("k", "answer")
+    later = time.time() + 11
+    monkeypatch.setattr(cache_module.time, "time", lambda: later)
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+def test_sizes_are_counted_in_utf8_bytes(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("k", "héllo")
+    stats = cache.stats()
+    assert stats["memory_bytes"] == 6
+    assert stats["disk_bytes"] == 6
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=1, max_disk_bytes=250)
+    cache.set("old", "x" * 100)
+    time.sleep(0.01)
+    cache.set("used", "y" * 100)
+    time.sleep(0.01)
+    cache.set("filler", "z" * 10)  # puts "used" out of memory
+    assert cache.get("old") == "x" * 100  # recency bumped: "old" is now the newest access
+    time.sleep(0.01)
+    cache.set("new", "w" * 100)  # over budget: evicts down to 90%
+    restarted = make_cache(tmp_path)
+    assert restarted.get("used") is None
+    assert restarted.get("old") == "x" * 100
+    assert restarted.get("new") == "w" * 100
+    assert restarted.stats()["disk_bytes"] <= 225
+
+def test_keys_depend_on_every_generation_parameter():
+    messages = [{"role": "user", "content": "hi"}]
+    key = CompletionCache.make_key("model", messages, 0.1, 1024)
+    assert key == CompletionCache.make_key("model", [dict(messages[0])], 0.1, 1024)
+    assert key != CompletionCache.make_key("other", messages, 0.1, 1024)
+    assert key != CompletionCache.make_key("model", messages, 0.2, 1024)
+    assert key != CompletionCache.make_key("model", messages, 0.1, 512)
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+from app.config import settings
+from app.services import llm_service as llm_module
+from app.services.llm_scheduler import LLMScheduler, Priority
+
+PRIMARY = "llama3-70b"
+FALLBACK = "gpt-oss-120b"
+
+class Stream:
+    def __init__(self, deltas):
+        self._deltas = iter(deltas)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            delta = next(self._deltas)
+        except StopIteration:
+            raise StopAsyncIteration
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+class Raw:
+    headers = {}
+
+    def __init__(self, deltas):
+        self._deltas = deltas
+
+    async def parse(self):
+        return Stream(self._deltas)
+
+def fake_client(responses):
+    """Groq client whose calls return Raw(responses[model]), or hang if that is None"""
+    async def create(model, **kwargs):
+        deltas = responses[model]
+        if deltas is None:
+            await asyncio.Event().wait()
+        return Raw(deltas)
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=create))))
+
+def setup(monkeypatch, responses):
+    scheduler = LLMScheduler(max_in_flight=4)
+    monkeypatch.setattr(llm_module, "llm_scheduler", scheduler)
+    monkeypatch.setattr(llm_module.llm_service, "groq_client", fake_client(responses))
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_FALLBACK_MODELS", {PRIMARY: FALLBACK})
+    monkeypatch.setattr(settings, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    return scheduler
+
+async def answer(served):
+    service = llm_module.llm_service
+    messages = [{"role": "user", "content": "hi"}]
+    return await service._collect(service._completion_stream(PRIMARY, messages, Priority.INTERACTIVE, served))
+
+def test_cancelled_hedge_loser_frees_its_slot(monkeypatch):
+    scheduler = setup(monkeypatch, {
+        settings.GROQ_MODELS[PRIMARY]: None,
+        settings.GROQ_MODELS[FALLBACK]: ["fall", "back"],
+    })
+
+    async def scenario():
+        served = {}
+        assert await answer(served) == "fallback"
+        assert served["model"] == FALLBACK
+        # the loser's cancellation is delivered on the next loop iterations
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert scheduler.stats()["in_flight"] == 0
+    asyncio.run(scenario())
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    scheduler = setup(monkeypatch, {
+        settings.GROQ_MODELS[PRIMARY]: ["prim", "ary"],
+        settings.GROQ_MODELS[FALLBACK]: ["fallback"],
+    })
+
+    async def scenario():
+        served = {}
+        assert await answer(served) == "primary"
+        assert served["model"] == PRIMARY
+        assert scheduler.stats()["dispatched"] == 1
+        assert scheduler.stats()["in_flight"] == 0
+    asyncio.run(scenario())
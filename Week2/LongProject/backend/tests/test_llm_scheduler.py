@@ -0,0 +1,130 @@
+import asyncio
+import groq
+import httpx
+from app.config import settings
+from app.services.llm_scheduler import LLMScheduler, Priority, parse_duration
+
+class Raw:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+async def hang():
+    await asyncio.Event().wait()
+
+async def respond():
+    return Raw()
+
+async def use(scheduler, call, priority=Priority.INTERACTIVE, order=None, name=None):
+    async with scheduler.request("llama3-70b", call, 100, priority):
+        if order is not None:
+            order.append(name)
+
+def test_parse_duration():
+    assert parse_duration("7.66s") == 7.66
+    assert abs(parse_duration("2m59.56s") - 179.56) < 1e-9
+    assert parse_duration("120ms") == 0.12
+    assert parse_duration("") is None
+
+def test_cancelled_call_releases_its_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=2)
+        tasks = [asyncio.create_task(use(scheduler, hang)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["in_flight"] == 2
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert scheduler.stats()["in_flight"] == 0
+        await asyncio.wait_for(use(scheduler, respond), timeout=1)
+        assert scheduler.stats()["in_flight"] == 0
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=1)
+        holder = asyncio.create_task(use(scheduler, hang))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(use(scheduler, respond))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["queue_depth"]["interactive"] == 1
+        waiter.cancel()
+        holder.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        stats = scheduler.stats()
+        assert stats["queue_depth"]["interactive"] == 0
+        assert stats["in_flight"] == 0
+    asyncio.run(scenario())
+
+def test_interactive_calls_are_admitted_before_bulk():
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=1)
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+            return Raw()
+
+        order = []
+        holder = asyncio.create_task(use(scheduler, held))
+        await asyncio.sleep(0.01)
+        bulk = asyncio.create_task(use(scheduler, respond, Priority.BULK, order, "bulk"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(use(scheduler, respond, Priority.INTERACTIVE, order, "interactive"))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(holder, bulk, interactive)
+        assert order == ["interactive", "bulk"]
+    asyncio.run(scenario())
+
+def test_exhausted_request_budget_waits_for_reset():
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=4)
+        scheduler.record_headers("llama3-70b", {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "200ms",
+        })
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await use(scheduler, respond)
+        assert loop.time() - start >= 0.15
+    asyncio.run(scenario())
+
+def test_rate_limited_call_is_retried(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE", 0.0)
+    request = httpx.Request("POST", "http://stub/v1/chat/completions")
+    failures = [
+        groq.RateLimitError("rate limited", response=httpx.Response(429, headers={"retry-after": "0"}, request=request), body=None),
+        groq.APIConnectionError(request=request),
+    ]
+
+    async def flaky():
+        if failures:
+            raise failures.pop(0)
+        return Raw()
+
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=1, max_retries=3)
+        await use(scheduler, flaky)
+        stats = scheduler.stats()
+        assert stats["retries"] == 2
+        assert stats["rate_limited"] == 1
+        assert stats["in_flight"] == 0
+    asyncio.run(scenario())
+
+def test_non_retryable_error_propagates():
+    request = httpx.Request("POST", "http://stub/v1/chat/completions")
+
+    async def bad_request():
+        raise groq.BadRequestError("bad", response=httpx.Response(400, request=request), body=None)
+
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=1, max_retries=3)
+        try:
+            await use(scheduler, bad_request)
+        except groq.BadRequestError:
+            pass
+        else:
+            raise AssertionError("BadRequestError was retried or swallowed")
+        assert scheduler.stats()["retries"] == 0
+        assert scheduler.stats()["in_flight"] == 0
+    asyncio.run(scenario())
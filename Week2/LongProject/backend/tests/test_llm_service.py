@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+from app.config import settings
+from app.services import llm_service as llm_module
+from app.services.llm_scheduler import LLMScheduler
+
+def test_groq_client_shares_the_pooled_http_client_and_timeout():
+    service = llm_module.llm_service
+    client = service.groq_client
+    assert client._client is service.http_client
+    assert client.timeout == service.http_client.timeout
+    assert client.timeout.connect == settings.GROQ_CONNECT_TIMEOUT
+    assert client.timeout.read == settings.GROQ_TIMEOUT
+    # retries belong to llm_scheduler
+    assert client.max_retries == 0
+
+def test_concurrent_chats_overlap(monkeypatch):
+    class Stream:
+        def __init__(self):
+            self._sent = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if self._sent:
+                raise StopAsyncIteration
+            self._sent = True
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="ok"))])
+
+    class Raw:
+        headers = {}
+
+        async def parse(self):
+            return Stream()
+
+    async def create(**kwargs):
+        await asyncio.sleep(0.2)  # one slow completion
+        return Raw()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=create))))
+    monkeypatch.setattr(llm_module.llm_service, "groq_client", client)
+    monkeypatch.setattr(llm_module, "llm_scheduler", LLMScheduler(max_in_flight=8))
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", False)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        answers = await asyncio.gather(*(
+            llm_module.llm_service.complete(f"question {i}", "llama3-70b", [], use_cache=False)
+            for i in range(5)
+        ))
+        return answers, loop.time() - start
+
+    answers, elapsed = asyncio.run(scenario())
+    assert answers == ["ok"] * 5
+    # five 0.2 s calls served one at a time would take a full second
+    assert elapsed < 0.6
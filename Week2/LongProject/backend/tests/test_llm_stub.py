@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import groq
+import httpx
+import pytest
+from app.services.llm_scheduler import parse_duration
+from app.tools.llm_stub import create_app
+from app.tools.load_test import parse_mix, percentile
+
+MODEL = "llama-3.3-70b-versatile"
+
+def stub_args(**overrides):
+    args = dict(ttft_ms=1, ttft_p95_ms=2, tokens_per_second=100000, output_tokens=20,
+                rpm=0, tpm=0, error_rate=0.0)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+def run_against_stub(args, scenario):
+    """Run scenario(client) with a real AsyncGroq client talking to the stub in-process"""
+    async def main():
+        transport = httpx.ASGITransport(app=create_app(args))
+        async with httpx.AsyncClient(transport=transport) as http_client:
+            client = groq.AsyncGroq(api_key="stub", base_url="http://stub", http_client=http_client, max_retries=0)
+            return await scenario(client)
+    return asyncio.run(main())
+
+def ask(client, **kwargs):
+    return client.chat.completions.with_raw_response.create(
+        model=MODEL, messages=[{"role": "user", "content": "hi"}], max_tokens=50, **kwargs
+    )
+
+def test_plain_completion():
+    async def scenario(client):
+        raw = await ask(client)
+        return (await raw.parse()).choices[0].message.content
+
+    assert len(run_against_stub(stub_args(), scenario).split()) > 0
+
+def test_streamed_completion():
+    async def scenario(client):
+        raw = await ask(client, stream=True)
+        stream = await raw.parse()
+        return "".join([chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices])
+
+    assert len(run_against_stub(stub_args(), scenario).split()) > 0
+
+def test_request_limit_answers_429_with_retry_after():
+    async def scenario(client):
+        raw = await ask(client)
+        headers = raw.headers
+        with pytest.raises(groq.RateLimitError) as error:
+            await ask(client)
+        return headers, error.value.response.headers
+
+    ok_headers, limited_headers = run_against_stub(stub_args(rpm=1), scenario)
+    assert ok_headers["x-ratelimit-remaining-requests"] == "0"
+    assert 0 < parse_duration(ok_headers["x-ratelimit-reset-requests"]) <= 60
+    assert 0 < float(limited_headers["retry-after"]) <= 60
+
+def test_unlimited_dimensions_send_no_budget_headers():
+    async def scenario(client):
+        return (await ask(client)).headers
+
+    headers = run_against_stub(stub_args(tpm=100000), scenario)
+    assert "x-ratelimit-remaining-requests" not in headers
+    assert int(headers["x-ratelimit-remaining-tokens"]) < 100000
+
+def test_injected_errors():
+    async def scenario(client):
+        with pytest.raises(groq.InternalServerError) as error:
+            await ask(client)
+        return error.value.status_code
+
+    assert run_against_stub(stub_args(error_rate=1.0), scenario) == 503
+
+def test_load_test_helpers():
+    assert percentile([], 0.5) is None
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.99) == 4.0
+    assert parse_mix("chat=6, direct-chat=3,upload") == {"chat": 6, "direct-chat": 3, "upload": 1}
+    with pytest.raises(SystemExit):
+        parse_mix("chat=1,search=2")
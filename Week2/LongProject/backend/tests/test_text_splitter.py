@@ -0,0 +1,43 @@
+import pytest
+from app.services import text_splitter as splitter_module
+from app.services.text_splitter import TokenTextSplitter
+from app.utils import tokenization
+from app.utils.tokenization import count_tokens, special_token_count
+
+WORDS = " ".join(f"word{i}" for i in range(500))
+
+def test_chunks_fit_the_budget_and_cover_the_text():
+    chunks = TokenTextSplitter(chunk_size=50, chunk_overlap=10).split_text(WORDS)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    seen = [word for chunk in chunks for word in chunk.split()]
+    assert sorted(set(seen), key=lambda word: int(word[4:])) == WORDS.split()
+
+def test_consecutive_chunks_overlap_on_whole_words():
+    chunks = TokenTextSplitter(chunk_size=50, chunk_overlap=10).split_text(WORDS)
+    for previous, current in zip(chunks, chunks[1:]):
+        first = current.split()[0]
+        assert first in previous.split()
+        assert first.startswith("word")
+
+def test_special_tokens_come_out_of_the_chunk_size(monkeypatch):
+    monkeypatch.setattr(splitter_module, "special_token_count", lambda model_name: 2)
+    chunks = TokenTextSplitter(chunk_size=50, chunk_overlap=10).split_text(WORDS)
+    assert max(count_tokens(chunk) for chunk in chunks) == 48
+
+def test_cuts_prefer_paragraph_and_sentence_boundaries():
+    paragraph = "Alpha beta gamma delta. Epsilon zeta eta theta iota. Kappa lambda mu."
+    text = "\n\n".join([paragraph] * 6)
+    for chunk in TokenTextSplitter(chunk_size=40, chunk_overlap=4).split_text(text)[:-1]:
+        assert chunk.endswith(".")
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        TokenTextSplitter(chunk_size=10, chunk_overlap=10)
+
+def test_missing_tokenizer_falls_back_to_the_regex_estimate(monkeypatch):
+    monkeypatch.setattr(tokenization, "get_tokenizer", lambda model_name: None)
+    assert special_token_count("some/unavailable-model") == 0
+    assert count_tokens("Hello, world!", "some/unavailable-model") == 4
+    chunks = TokenTextSplitter(chunk_size=50, chunk_overlap=10, model_name="some/unavailable-model").split_text(WORDS)
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)